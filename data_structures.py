@@ -1,6 +1,7 @@
 
 
 from collections import deque # use collections.deque for queue
+# rolling min/max/mean over a deque window: examples/windows.py
 from math import pi
 from random import randint
 
@@ -17,6 +18,7 @@ queue.popleft()
 [(x, x**2) for x in range(6)]
 vec = [[1,2,3], [4,5,6], [7,8,9]]
 [num for elem in vec for num in elem]
+# mostly-zero matrices: see examples/sparse.py for CSR/CSC storage
 
 [str(round(pi, i)) for i in range(1, 6)]
 
@@ -41,13 +43,16 @@ b                                 # unique letters in a
 a - b                              # letters in a but not in b
 a | b                              # letters in a or b or both
 a & b                              # letters in both a and b
+# for sorted id arrays (posting lists) see examples/sortedsets.py
 a ^ b                 
 a = {x for x in 'abracadabra' if x not in 'abc'}
+# membership over billions of keys: Bloom/cuckoo filters in examples/filters.py
 a
 
 tel = {'jack': 4098, 'sape': 4139}
 list(tel)
 sorted(tel)
+# millions of names with prefix search: see examples/prefixindex.py
 dict([('sape', 4139), ('guido', 4127), ('jack', 4098)])
 {x: x**2 for x in (2, 4, 6)}
 dict(sape=4139, guido=4127, jack=4098)
@@ -64,8 +69,10 @@ for i in reversed(range(1, 10, 2)):
     print(i)
 
 basket = ['apple', 'orange', 'apple', 'pear', 'orange', 'banana']
+# for millions of rows with few distinct values see examples/categorical.py
 for f in sorted(set(basket)):
     print(f)
+# for input bigger than memory see examples/extsort.py
 
 (1, 2, 3)              < (1, 2, 4)
 [1, 2, 3]              < [1, 2, 4]
@@ -74,6 +81,7 @@ for f in sorted(set(basket)):
 (1, 2)                 < (1, 2, -1)
 (1, 2, 3)             == (1.0, 2.0, 3.0)
 (1, 2, ('aa', 'ab'))   < (1, 2, ('abc', 'a'), 4)
+# examples/keycodec.py encodes tuples as bytes that compare the same way
 
 # =============================================================================
 # E.P.1 i5: Know How to Slice Sequences
@@ -87,6 +95,7 @@ a[20]
 a[2:7] = [99, 22, 14] # list will grow or shrink
 b = a[:]
 assert b == a and b is not a
+# O(n) per snapshot, examples/pvector.py snapshots a persistent vector in O(1)
 b = a
 a[:] = [101, 102, 103]
 assert a is b
@@ -115,6 +124,7 @@ y.decode('utf-8') # error
 # or use islice from the itertools
 b = a[::2] 
 c = b[1:-1] 
+# examples/seqview.py composes such slices as O(1) views without copying
 
 # =============================================================================
 # E.P.1 i7: Use List Comprehensions Instead of map and filter
@@ -128,6 +138,7 @@ even_squares = map(lambda x: x**2, filter(lambda x: x % 2 == 0, a))
 even_squares = [x**2 for x in a if x % 2 == 0] # easier to read
 
 chile_ranks = {'ghost': 1, 'habanero': 2, 'cayenne': 3}
+# static tables with millions of entries: see examples/frozentable.py
 rank_dict = {rank: name for name, rank in chile_ranks.items()}
 chile_len_set = {len(name) for name in rank_dict.values()}
 
@@ -152,11 +163,13 @@ filtered = [[x for x in row if x % 3 == 0]
 # =============================================================================
 
 [x**2 for x in range(20)] # can crash for large inputs
+# examples/idiom_bench.py measures the claims in this file
 it = (x**2 for x in range(20)) # generator expression
 it
 next(it)
 roots = ((x, x**0.5) for x in it) # Chaining generators executes very quickly
 next(roots)
+# examples/streams.py fuses such chains into one generator per run of stages
 
 # =============================================================================
 # E.P.1 i10: Prefer enumerate Over range
@@ -167,6 +180,7 @@ for i in range(5):
     if randint(0, 1):
         random_bits |= 1 << i
 random_bits
+# getrandbits(n) draws all n bits at once; see examples/bulkrandom.py
 
 flavor_list = ['vanilla', 'chocolate', 'pecan', 'strawberry']
 for i, flavor in enumerate(flavor_list, 1):
@@ -189,6 +203,7 @@ for name, count in zip(names, letters):
     if count > max_letters:
         longest_name = name
         max_letters = count
+# for million-row parallel columns see examples/recordbatch.py
 
 # =============================================================================
 # E.P.1 i46: Use Built-in Algorithms and Data Structures
@@ -202,6 +217,7 @@ x = fifo.popleft() # Consumer
 # ordered dictionary
 # keeps track of the order in which its keys were inserted
 # simplify testing and debugging by making all code deterministic
+# move_to_end makes it an O(1) LRU list, see examples/caches.py
 from collections import OrderedDict 
 
 a = OrderedDict()
@@ -220,6 +236,8 @@ from collections import defaultdict
 int()
 stats = defaultdict(int)
 stats['my_counter'] += 1
+# grows without bound for unbounded keys, see examples/counters.py for
+# memory-bounded exact / Count-Min / Space-Saving counters
 
 # heap queue
 from heapq import heappush, heappop, nsmallest
@@ -235,12 +253,14 @@ print(heappop(a), heappop(a), heappop(a), heappop(a))
 
 nsmallest(1, a)[0]
 a[0]
+# top-k and percentiles of unbounded streams: see examples/sketches.py
 
 # bisection
 x = list(range(10**6))
 i = x.index(991234)
 
 from bisect import bisect_left
+# sorted files too big to load: examples/filebisect.py bisects them via mmap
 
 # iterator tools
 """
@@ -248,6 +268,8 @@ Linking iterators together
 • chain: Combines multiple iterators into a single sequential iterator.
 • cycle: Repeats an iterator’s items forever.
 • tee: Splits a single iterator into multiple parallel iterators.
+(buffers everything between the fastest and slowest consumer in memory,
+examples/spilltee.py spills the backlog to disk instead)
 • zip_longest: A variant of the zip built-in function that works well with
 iterators of different lengths.
 Filtering items from an iterator
@@ -265,6 +287,8 @@ nice alternative to deeply nested list comprehensions.
 iterator.
 • combination: Returns the unordered combinations of length N with
 unrepeated items from an iterator.
+(examples/combinatorics.py indexes all three: the nth item, its rank,
+slices and random samples without walking the iterator)
 """
 
 
@@ -59,6 +59,7 @@ for arg in sys.argv[1:]:
     else: # get executed if no exeption got raised
         print(arg, 'has', len(f.readlines()), 'lines')
         f.close()
+# line counts and random access on huge files: examples/linefile.py
 
 try:
     # The presence and type of the argument depend on the exception type
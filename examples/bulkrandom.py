@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Batched random numbers for loops like the `random_bits` one in
+data_structures.py (E.P.1 i10), which calls randint(0, 1) per bit.
+
+Each randint() call goes through several Python-level frames
+(randint -> randrange -> _randbelow). BulkRandom draws one large buffer
+at a time (getrandbits, os.urandom or a NumPy Generator) and serves:
+
+• scalars from the buffer: bit(), getrandbits(k), randint(a, b), random();
+• vectors: bit_array(n), integers(low, high, n), floats(n), as NumPy
+  arrays with the numpy backend and array.array otherwise, built with
+  bytes.translate for ranges inside 0..254, and otherwise map/filter over
+  buffer words of the narrowest width that holds the range, so the loop
+  runs in C.
+
+Bounded ints are exact: words are shifted to the bit length of the range
+and out-of-range values rejected, like random.Random._randbelow.
+
+Scalar calls still cost one Python method call each, about as much as
+random.randint; the order-of-magnitude gains come from the vector APIs
+and from getrandbits(n) for many bits at once.
+
+A seeded stream is reproducible for a given backend; spawn(n) derives n
+independent seeded streams, e.g. one per worker process.
+"""
+
+import hashlib
+import os
+import random
+import time
+from array import array
+from itertools import repeat, starmap
+from operator import mul, rshift
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# byte -> its 8 bits, least significant first, as 0/1 bytes
+_BITS = [bytes((byte >> i) & 1 for i in range(8)) for byte in range(256)]
+_FLOAT_SCALE = 2.0 ** -53
+
+
+class BulkRandom:
+    """
+    Args:
+        seed: int seed for a reproducible stream; None seeds from the OS.
+        backend: 'numpy', 'python' (random.Random.getrandbits), 'urandom'
+            (os.urandom, not reproducible) or 'auto' for numpy if present.
+        buffer_size: bytes drawn per refill.
+    """
+
+    def __init__(self, seed=None, backend='auto', buffer_size=1 << 16):
+        if backend == 'auto':
+            backend = 'numpy' if numpy is not None else 'python'
+        if backend == 'numpy':
+            if numpy is None:
+                raise ValueError('the numpy backend needs NumPy installed')
+            self._generator = numpy.random.default_rng(seed)
+            self._draw = self._generator.bytes
+        elif backend == 'python':
+            rng = random.Random(seed)
+            self._draw = lambda size: rng.getrandbits(8 * size).to_bytes(
+                size, 'little')
+            self._random = rng.random
+        elif backend == 'urandom':
+            if seed is not None:
+                raise ValueError('os.urandom cannot be seeded')
+            self._draw = os.urandom
+        else:
+            raise ValueError(f'unknown backend {backend!r}')
+        if backend != 'python':
+            self._random = None
+        self.seed = seed
+        self.backend = backend
+        self.buffer_size = buffer_size - buffer_size % 8
+        self._words = array('Q')
+        self._next = 0
+        self._bit_word = 0
+        self._bits_left = 0
+
+    def spawn(self, n):
+        """n independent streams seeded from this stream's seed."""
+        if self.seed is None:
+            return [BulkRandom(None, self.backend, self.buffer_size)
+                    for _ in range(n)]
+        children = []
+        for i in range(n):
+            digest = hashlib.blake2b(f'{self.seed}/{i}'.encode(),
+                                     digest_size=16).digest()
+            children.append(BulkRandom(int.from_bytes(digest, 'little'),
+                                       self.backend, self.buffer_size))
+        return children
+
+    def _refill(self):
+        self._words = array('Q', self._draw(self.buffer_size))
+        self._next = 0
+
+    def _word(self):
+        i = self._next
+        if i == len(self._words):
+            self._refill()
+            i = 0
+        self._next = i + 1
+        return self._words[i]
+
+    def _take_words(self, n):
+        """n fresh 64-bit words, leftovers of the buffer first."""
+        start = self._next
+        words = self._words[start:start + n]
+        self._next = start + len(words)
+        missing = n - len(words)
+        if missing:
+            words += array('Q', self._draw(8 * missing))
+        return words
+
+    # scalars
+
+    def bit(self):
+        if not self._bits_left:
+            self._bit_word = self._word()
+            self._bits_left = 64
+        self._bits_left -= 1
+        bit = self._bit_word & 1
+        self._bit_word >>= 1
+        return bit
+
+    def getrandbits(self, k):
+        """An int of k random bits, like random.getrandbits."""
+        if k <= 64:
+            return self._word() >> (64 - k) if k else 0
+        words = self._take_words((k + 63) // 64)
+        return int.from_bytes(words.tobytes(), 'little') >> (-k % 64)
+
+    def randint(self, a, b):
+        """Uniform int in [a, b], both ends included."""
+        span = b - a + 1
+        if span <= 0:
+            raise ValueError(f'empty range [{a}, {b}]')
+        if span > 1 << 64:
+            while True:
+                value = self.getrandbits(span.bit_length())
+                if value < span:
+                    return a + value
+        shift = 64 - (span - 1).bit_length()
+        while True:
+            value = self._word() >> shift
+            if value < span:
+                return a + value
+
+    def random(self):
+        """Float in [0.0, 1.0) with 53 random bits, like random.random."""
+        return (self._word() >> 11) * _FLOAT_SCALE
+
+    # vectors
+
+    def bit_array(self, n):
+        """n random 0/1 values."""
+        if self.backend == 'numpy':
+            return self._generator.integers(0, 2, n, dtype=numpy.uint8)
+        words = self._take_words((n + 63) // 64)
+        return array('B', b''.join(map(_BITS.__getitem__,
+                                       words.tobytes()))[:n])
+
+    def integers(self, low, high, n):
+        """n uniform ints in [low, high), high excluded as in NumPy."""
+        span = high - low
+        if span <= 0:
+            raise ValueError(f'empty range [{low}, {high})')
+        if self.backend == 'numpy':
+            return self._generator.integers(low, high, n)
+        if span > 1 << 63:
+            raise ValueError('range too wide for an array of int64')
+        bits = (span - 1).bit_length()
+        if span < 256 and low >= 0 and high <= 255:
+            return self._small_integers(low, span, 8 - bits, n)
+        typecode = next(code for code in 'BHIQ'
+                        if 8 * array(code).itemsize >= bits)
+        width = array(typecode).itemsize
+        shift = 8 * width - bits
+        result = array('q')
+        while len(result) < n:
+            # each word is accepted with probability over 1/2
+            count = 2 * (n - len(result)) + 16
+            words = array(typecode, self._take_words(
+                (count * width + 7) // 8).tobytes())
+            accepted = filter(span.__gt__, map(rshift, words, repeat(shift)))
+            result.extend(map(low.__add__, accepted) if low else accepted)
+        del result[n:]
+        return result
+
+    def _small_integers(self, low, span, shift, n):
+        # one translate maps each byte to low + (byte >> shift), or to the
+        # 0xff marker when rejected, and replace() drops the markers
+        table = bytes(low + (byte >> shift) if byte >> shift < span else 255
+                      for byte in range(256))
+        result = bytearray()
+        while len(result) < n:
+            needed = 2 * (n - len(result)) + 16
+            raw = self._take_words((needed + 7) // 8).tobytes()
+            result += raw.translate(table).replace(b'\xff', b'')
+        return array('q', memoryview(result)[:n])
+
+    def floats(self, n):
+        """n uniform floats in [0.0, 1.0)."""
+        if self.backend == 'numpy':
+            return self._generator.random(n)
+        if self._random is not None:
+            # random.Random.random is already C, one call per float
+            return array('d', starmap(self._random, repeat((), n)))
+        words = self._take_words(n)
+        return array('d', map(mul, map(rshift, words, repeat(11)),
+                              repeat(_FLOAT_SCALE)))
+
+
+if __name__ == "__main__":
+    n = 1_000_000
+
+    def bench(label, fn):
+        start_time = time.time()
+        fn()
+        print(f"  {label:28} {time.time() - start_time:.4f}s")
+
+    print(f"{n} random bits")
+    bench('randint(0, 1) loop',
+          lambda: [random.randint(0, 1) for _ in range(n)])
+    backends = ['python', 'urandom'] + (['numpy'] if numpy is not None else [])
+    for backend in backends:
+        rng = BulkRandom(seed=None if backend == 'urandom' else 42,
+                         backend=backend)
+        bench(f'{backend} getrandbits({n})', lambda: rng.getrandbits(n))
+        bench(f'{backend} bit_array', lambda: rng.bit_array(n))
+        bench(f'{backend} bit() loop', lambda: [rng.bit() for _ in range(n)])
+
+    print(f"{n} dice rolls")
+    bench('randint(1, 6) loop',
+          lambda: [random.randint(1, 6) for _ in range(n)])
+    for backend in backends:
+        rng = BulkRandom(seed=None if backend == 'urandom' else 42,
+                         backend=backend)
+        bench(f'{backend} randint loop',
+              lambda: [rng.randint(1, 6) for _ in range(n)])
+        bench(f'{backend} integers', lambda: rng.integers(1, 7, n))
+
+    print(f"{n} floats")
+    bench('random() loop', lambda: [random.random() for _ in range(n)])
+    for backend in backends:
+        rng = BulkRandom(seed=None if backend == 'urandom' else 42,
+                         backend=backend)
+        bench(f'{backend} floats', lambda: rng.floats(n))
+
+    for backend in backends[::2]:
+        first, second = BulkRandom(7, backend).spawn(2)
+        assert list(first.integers(0, 100, 10)) == \
+            list(BulkRandom(7, backend).spawn(1)[0].integers(0, 100, 10))
+        assert list(first.floats(3)) != list(second.floats(3))
+    if numpy is None:
+        print("numpy backend skipped, NumPy is not installed")
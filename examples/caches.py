@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+LRU cache with TTL built on the OrderedDict from data_structures.py
+(E.P.1 i46): move_to_end() and popitem(last=False) are both O(1), so the
+dict order doubles as the recency list.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+_MISSING = object()
+# separates positional from keyword arguments in cached() keys, as
+# functools does, so f((1, 2)) and f(1, 2) cannot share an entry
+_KWD_MARK = (object(),)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return (f'CacheStats(hits={self.hits}, misses={self.misses}, '
+                f'evictions={self.evictions}, '
+                f'expirations={self.expirations}, '
+                f'hit_rate={self.hit_rate:.3f})')
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with entry and byte limits and per-entry TTL.
+    Args:
+        max_entries: evict once more than this many entries are held.
+        max_bytes: evict once the summed size of the values exceeds this.
+        size: function value -> size in bytes, only used with max_bytes.
+            Defaults to sys.getsizeof.
+        ttl: default time-to-live in seconds, None for no expiry.
+        on_evict: callback(key, value, reason) with reason 'capacity',
+            'expired' or 'deleted'.
+        clock: time source, time.monotonic by default.
+    Expired entries are dropped lazily, when they are looked up or reach the
+    LRU end, so no background thread is needed.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, size=None,
+                 ttl=None, on_evict=None, clock=time.monotonic):
+        if size is None:
+            from sys import getsizeof as size
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+        self.stats = CacheStats()
+        self.nbytes = 0
+        # key -> (value, size, expires_at)
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}({len(self._data)} entries, '
+                f'{self.nbytes} bytes, {self.stats!r})')
+
+    def _expired(self, entry):
+        expires_at = entry[2]
+        return expires_at is not None and expires_at <= self.clock()
+
+    def _remove(self, key, reason):
+        value, nbytes, _ = self._data.pop(key)
+        self.nbytes -= nbytes
+        if reason == 'expired':
+            self.stats.expirations += 1
+        elif reason == 'capacity':
+            self.stats.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key, value, reason)
+        return value
+
+    def get(self, key, default=None):
+        data = self._data
+        entry = data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.stats.misses += 1
+            return default
+        if entry[2] is not None and self._expired(entry):
+            self._remove(key, 'expired')
+            self.stats.misses += 1
+            return default
+        data.move_to_end(key)
+        self.stats.hits += 1
+        return entry[0]
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def put(self, key, value, ttl=_MISSING):
+        """
+        Insert or replace `key`, marking it most recently used.
+        `ttl` overrides the cache default for this entry; None never expires.
+        """
+        if ttl is _MISSING:
+            ttl = self.ttl
+        nbytes = self.size(value) if self.max_bytes is not None else 0
+        if key in self._data:
+            self.nbytes -= self._data.pop(key)[1]
+        expires_at = None if ttl is None else self.clock() + ttl
+        self._data[key] = (value, nbytes, expires_at)
+        self.nbytes += nbytes
+        self._shrink()
+
+    __setitem__ = put
+
+    def __delitem__(self, key):
+        self._remove(key, 'deleted')
+
+    def pop(self, key, default=_MISSING):
+        if key in self._data:
+            return self._remove(key, 'deleted')
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def _over(self):
+        return ((self.max_entries is not None
+                 and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None
+                    and self.nbytes > self.max_bytes))
+
+    def _shrink(self):
+        data = self._data
+        while data and self._over():
+            key, entry = next(iter(data.items()))
+            self._remove(key, 'expired' if self._expired(entry)
+                         else 'capacity')
+
+    def purge_expired(self):
+        """Drop every expired entry now; O(n), unlike the lazy path."""
+        for key, entry in list(self._data.items()):
+            if self._expired(entry):
+                self._remove(key, 'expired')
+
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+
+
+class ThreadSafeLRUCache(LRUCache):
+    """
+    LRUCache guarded by one lock; even get() reorders the dict, so reads
+    need the lock as well.
+    """
+
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return super().get(key, default)
+
+    def put(self, key, value, ttl=_MISSING):
+        with self._lock:
+            super().put(key, value, ttl)
+
+    __setitem__ = put
+
+    def __contains__(self, key):
+        with self._lock:
+            return super().__contains__(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+
+    def pop(self, key, default=_MISSING):
+        with self._lock:
+            return super().pop(key, default)
+
+    def purge_expired(self):
+        with self._lock:
+            super().purge_expired()
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+
+def cached(cache):
+    """Memoize a function in `cache`, like functools.lru_cache."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = args
+            if kwargs:
+                key += _KWD_MARK
+                for item in kwargs.items():
+                    key += item
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    from counters import zipf_events
+
+    def lookup(n):
+        return n * 2
+
+    keys = zipf_events(500_000, 100_000)
+    for size in (1_000, 10_000):
+        builtin = lru_cache(maxsize=size)(lookup)
+        ours = cached(LRUCache(max_entries=size))(lookup)
+        locked = cached(ThreadSafeLRUCache(max_entries=size))(lookup)
+        for name, func in [('functools.lru_cache', builtin),
+                           ('LRUCache', ours),
+                           ('ThreadSafeLRUCache', locked)]:
+            start_time = time.time()
+            for key in keys:
+                func(key)
+            duration = time.time() - start_time
+            if name == 'functools.lru_cache':
+                info = func.cache_info()
+                rate = info.hits / (info.hits + info.misses)
+            else:
+                rate = func.cache.stats.hit_rate
+            print(f"size {size:6d} {name:20} {duration:.3f}s "
+                  f"hit rate {rate:.3f}")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Dictionary-encoded string column for data shaped like `basket` in
+data_structures.py: many rows, few distinct values.
+
+    basket = ['apple', 'orange', 'apple', 'pear', 'orange', 'banana']
+
+A list of str costs one 8-byte pointer per row plus the str objects. Here
+each distinct string is stored once and every row is a 4-byte code in an
+array('I'), so counting, filtering and grouping work on small ints and
+strings are only rebuilt when rows are decoded.
+"""
+
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import Counter
+
+
+class Categorical:
+    """
+    Column of strings stored as `codes` into `categories`.
+    Slicing returns another Categorical sharing the same dictionary.
+    """
+
+    def __init__(self, values=(), categories=None):
+        self.categories = []
+        self.index = {}
+        self.codes = array('I')
+        # how many categories are known to occur in this column: all of
+        # them while it owns its dictionary, None once that is unknown
+        self._in_use = 0 if categories is None else None
+        for category in categories or ():
+            self._code(category)
+        self.extend(values)
+
+    def _code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            value = sys.intern(value)
+            code = self.index[value] = len(self.categories)
+            if self._in_use == code:
+                self._in_use += 1
+            self.categories.append(value)
+        return code
+
+    @classmethod
+    def _share(cls, parent, codes):
+        column = cls.__new__(cls)
+        column.categories = parent.categories
+        column.index = parent.index
+        column.codes = codes
+        column._in_use = None
+        return column
+
+    def append(self, value):
+        self.codes.append(self._code(value))
+
+    def extend(self, values):
+        index = self.index
+        codes = self.codes
+        code = self._code
+        # the dict hit is the common case, so only misses go through _code
+        codes.extend(index[value] if value in index else code(value)
+                     for value in values)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return self._share(self, self.codes[row])
+        return self.categories[self.codes[row]]
+
+    def __iter__(self):
+        # lazy decoding, one list lookup per row in C
+        return map(self.categories.__getitem__, self.codes)
+
+    def __repr__(self):
+        return (f'Categorical({len(self)} rows, '
+                f'{len(self.categories)} categories)')
+
+    def decode(self):
+        return list(self)
+
+    def unique(self):
+        """sorted(set(column)) without decoding any row."""
+        if self._in_use == len(self.categories):
+            # every category was added by a row of this column
+            return sorted(self.categories)
+        used = set(self.codes)
+        if len(used) == len(self.categories):
+            return sorted(self.categories)
+        return sorted(self.categories[code] for code in used)
+
+    def value_counts(self):
+        """Counter of value -> rows, counted on the codes."""
+        categories = self.categories
+        return Counter({categories[code]: count
+                        for code, count in Counter(self.codes).items()})
+
+    def rows_equal(self, value):
+        """Row numbers where the column equals `value`."""
+        code = self.index.get(value)
+        if code is None:
+            return array('I')
+        # array.index scans in C, so a selective filter costs one Python
+        # step per match instead of one per row
+        codes = self.codes
+        rows = array('I')
+        row = -1
+        try:
+            while True:
+                row = codes.index(code, row + 1)
+                rows.append(row)
+        except ValueError:
+            return rows
+
+    def filter_equal(self, value):
+        code = self.index.get(value)
+        if code is None:
+            return self._share(self, array('I'))
+        return self._share(self, array('I', [code]) * self.codes.count(code))
+
+    def take(self, rows):
+        codes = self.codes
+        return self._share(self, array('I', map(codes.__getitem__, rows)))
+
+    def group_rows(self):
+        """{value: array of row numbers}, one pass over the codes."""
+        groups = [array('I') for _ in self.categories]
+        appends = [group.append for group in groups]
+        for row, code in enumerate(self.codes):
+            appends[code](row)
+        return {category: group
+                for category, group in zip(self.categories, groups) if group}
+
+    def group_sum(self, values):
+        """{value: sum of `values` over its rows}."""
+        sums = [0] * len(self.categories)
+        for code, value in zip(self.codes, values):
+            sums[code] += value
+        used = set(self.codes)
+        return {self.categories[code]: sums[code] for code in sorted(used)}
+
+    def nbytes(self):
+        return (self.codes.itemsize * len(self.codes)
+                + sum(sys.getsizeof(c) for c in self.categories))
+
+
+def make_rows(n, distinct=300):
+    # a new str object per row, like values parsed from a file
+    return [f'fruit-{(i * 7919) % distinct:03d}' for i in range(n)]
+
+
+def group_sum_list(rows, values):
+    sums = {}
+    for name, value in zip(rows, values):
+        sums[name] = sums.get(name, 0) + value
+    return sums
+
+
+if __name__ == "__main__":
+    n = 1_000_000
+    tracemalloc.start()
+    rows = make_rows(n)
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    column = Categorical(rows)
+    column_bytes = tracemalloc.get_traced_memory()[0] - list_bytes
+    tracemalloc.stop()
+    print(f"memory: list of str {list_bytes / 2**20:.1f} MiB, "
+          f"Categorical {column_bytes / 2**20:.1f} MiB")
+
+    values = list(range(n))
+    for name, func in [
+            ('sorted(set(list))', lambda: sorted(set(rows))),
+            ('Categorical.unique', column.unique),
+            ('Counter(list)', lambda: Counter(rows)),
+            ('Categorical.value_counts', column.value_counts),
+            ('list == filter', lambda: [i for i, r in enumerate(rows)
+                                        if r == 'fruit-042']),
+            ('Categorical.rows_equal', lambda: column.rows_equal('fruit-042')),
+            ('group-by sum, list', lambda: group_sum_list(rows, values)),
+            ('group-by sum, Categorical',
+             lambda: column.group_sum(values))]:
+        start_time = time.time()
+        func()
+        duration = time.time() - start_time
+        print(f"{name:26} {duration * 1e3:8.1f} ms")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Random access into itertools.product, permutations and combinations.
+
+The itertools versions can only be walked from the start, so the 10**12th
+permutation costs 10**12 steps. The classes here are lazy Sequences over
+the same spaces, in the same order as itertools:
+
+• space[i] unranks: computes the i-th tuple directly in O(r) arithmetic
+  steps (O(n * r) list work for permutations and combinations).
+• space.index(t) ranks: the inverse.
+• space[a:b:c] is another lazy space over a range of ranks, so a search
+  space can be cut into shards with shards(n) and sent to workers.
+• choice() and sample(k) draw uniformly without enumerating.
+
+len() only works below sys.maxsize, like range; `size` is the exact count
+for spaces of any size.
+"""
+
+import math
+import random
+import sys
+import time
+from collections.abc import Sequence
+from itertools import combinations, islice, permutations, product
+from multiprocessing import Pool
+
+
+def _range_size(r):
+    if r.step > 0:
+        return max(0, (r.stop - r.start + r.step - 1) // r.step)
+    return max(0, (r.start - r.stop - r.step - 1) // -r.step)
+
+
+class _Space(Sequence):
+    """
+    Base class: subclasses give `_total()`, `_unrank(rank)`, `_rank(items)`
+    and `_iter_all()`; this class maps positions to ranks through `indexes`.
+    """
+
+    def __init__(self):
+        self.indexes = range(self._total())
+
+    def _view(self, indexes):
+        space = object.__new__(type(self))
+        space.__dict__.update(self.__dict__)
+        space.indexes = indexes
+        return space
+
+    @property
+    def size(self):
+        return _range_size(self.indexes)
+
+    def __len__(self):
+        size = self.size
+        if size > sys.maxsize:
+            raise OverflowError(f'{size} items, use .size')
+        return size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._view(self.indexes[index])
+        return self._unrank(self.indexes[index])
+
+    def __iter__(self):
+        r = self.indexes
+        if r.step == 1 and r.start == 0 and r.stop == self._total():
+            return self._iter_all()
+        return map(self._unrank, r)
+
+    def __reversed__(self):
+        return iter(self[::-1])
+
+    def __contains__(self, items):
+        try:
+            self.index(items)
+        except ValueError:
+            return False
+        return True
+
+    def index(self, items, start=0, stop=None):
+        """Position of the first occurrence of `items`."""
+        items = tuple(items)
+        rank = self._rank(items)
+        if rank is None or rank not in self.indexes:
+            raise ValueError(f'{items!r} is not in the space')
+        position = self.indexes.index(rank)
+        if position < start or (stop is not None and position >= stop):
+            raise ValueError(f'{items!r} is not in the space')
+        return position
+
+    def choice(self, rng=random):
+        return self[rng.randrange(self.size)]
+
+    def sample(self, k, rng=random):
+        """k distinct positions drawn uniformly, returned as tuples."""
+        size = self.size
+        if k > size:
+            raise ValueError('sample larger than the space')
+        if size <= sys.maxsize:
+            positions = rng.sample(range(size), k)
+        else:
+            # collisions are vanishingly rare in a space this big
+            positions = set()
+            while len(positions) < k:
+                positions.add(rng.randrange(size))
+        return [self[position] for position in positions]
+
+    def shards(self, n):
+        """Split into n contiguous, nearly equal lazy spaces."""
+        size = self.size
+        bounds = [size * i // n for i in range(n + 1)]
+        return [self[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+    def __repr__(self):
+        r = self.indexes
+        return (f'{type(self).__name__}(<{self._total()} items>, '
+                f'range({r.start}, {r.stop}, {r.step}))')
+
+
+def _first_position(pool, value, available):
+    """Index into `available` of the first pool position holding value."""
+    for i, position in enumerate(available):
+        if pool[position] == value:
+            return i
+    return None
+
+
+class IndexedProduct(_Space):
+    """itertools.product(*pools, repeat=repeat) with random access."""
+
+    def __init__(self, *pools, repeat=1):
+        self.pools = [tuple(pool) for pool in pools] * repeat
+        super().__init__()
+
+    def _total(self):
+        return math.prod(map(len, self.pools))
+
+    def _iter_all(self):
+        return product(*self.pools)
+
+    def _unrank(self, rank):
+        items = []
+        # mixed radix, the last pool varies fastest
+        for pool in reversed(self.pools):
+            rank, digit = divmod(rank, len(pool))
+            items.append(pool[digit])
+        items.reverse()
+        return tuple(items)
+
+    def _rank(self, items):
+        if len(items) != len(self.pools):
+            return None
+        rank = 0
+        for pool, value in zip(self.pools, items):
+            try:
+                rank = rank * len(pool) + pool.index(value)
+            except ValueError:
+                return None
+        return rank
+
+
+class IndexedPermutations(_Space):
+    """itertools.permutations(pool, r) with random access."""
+
+    def __init__(self, pool, r=None):
+        self.pool = tuple(pool)
+        self.r = len(self.pool) if r is None else r
+        super().__init__()
+
+    def _total(self):
+        return math.perm(len(self.pool), self.r)
+
+    def _iter_all(self):
+        return permutations(self.pool, self.r)
+
+    def _unrank(self, rank):
+        n, r = len(self.pool), self.r
+        available = list(range(n))
+        items = []
+        for i in range(r):
+            # each choice here is followed by perm(n - i - 1, r - i - 1) tails
+            block = math.perm(n - i - 1, r - i - 1)
+            digit, rank = divmod(rank, block)
+            items.append(self.pool[available.pop(digit)])
+        return tuple(items)
+
+    def _rank(self, items):
+        n, r = len(self.pool), self.r
+        if len(items) != r:
+            return None
+        available = list(range(n))
+        rank = 0
+        for i, value in enumerate(items):
+            # repeated pool values: the earliest free position ranks lowest
+            digit = _first_position(self.pool, value, available)
+            if digit is None:
+                return None
+            available.pop(digit)
+            rank += digit * math.perm(n - i - 1, r - i - 1)
+        return rank
+
+
+class IndexedCombinations(_Space):
+    """itertools.combinations(pool, r) with random access."""
+
+    def __init__(self, pool, r):
+        self.pool = tuple(pool)
+        self.r = r
+        super().__init__()
+
+    def _total(self):
+        return math.comb(len(self.pool), self.r)
+
+    def _iter_all(self):
+        return combinations(self.pool, self.r)
+
+    def _unrank(self, rank):
+        n, r = len(self.pool), self.r
+        items = []
+        position = 0
+        for i in range(r):
+            # skip whole blocks of combinations starting at `position`
+            while True:
+                block = math.comb(n - position - 1, r - i - 1)
+                if rank < block:
+                    break
+                rank -= block
+                position += 1
+            items.append(self.pool[position])
+            position += 1
+        return tuple(items)
+
+    def _rank(self, items):
+        n, r = len(self.pool), self.r
+        if len(items) != r:
+            return None
+        rank = 0
+        position = 0
+        for i, value in enumerate(items):
+            found = _first_position(self.pool, value, range(position, n))
+            if found is None:
+                return None
+            for skipped in range(position, position + found):
+                rank += math.comb(n - skipped - 1, r - i - 1)
+            position += found + 1
+        return rank
+
+
+def count_matches(space):
+    """Worker: how many permutations in this shard start in order."""
+    return sum(1 for items in space if items[0] < items[1] < items[2])
+
+
+if __name__ == "__main__":
+    space = IndexedPermutations(range(20))
+    start_time = time.time()
+    nth = space[10**15]
+    print(f"{space.size} permutations of 20; #10**15 is {nth}, unranked in "
+          f"{time.time() - start_time:.6f}s, index() gives back "
+          f"{space.index(nth)}")
+
+    target = 2_000_000
+    start_time = time.time()
+    walked = next(islice(permutations(range(20)), target, None))
+    walk = time.time() - start_time
+    start_time = time.time()
+    assert space[target] == walked
+    print(f"#{target}: islice walk {walk:.3f}s, unrank "
+          f"{time.time() - start_time:.6f}s")
+
+    words = IndexedProduct('abcdefghijklmnopqrstuvwxyz', repeat=12)
+    print(f"{words.size} 12-letter words, 3 random: "
+          f"{[''.join(word) for word in words.sample(3)]}")
+
+    space = IndexedPermutations(range(10), 7)
+    start_time = time.time()
+    with Pool() as pool:
+        total = sum(pool.map(count_matches, space.shards(8)))
+    print(f"{total} of {len(space)} partial permutations match, "
+          f"8 shards in {time.time() - start_time:.2f}s")
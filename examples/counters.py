@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Memory-bounded replacements for the `stats = defaultdict(int)` counter idiom
+in data_structures.py (E.P.1 i46).
+
+Three modes share one Counter-like interface (`c[key] += 1`, `update`,
+`most_common`, `total`, `merge`):
+
+• exact: a Counter that refuses to grow past its budget.
+• cms: a Count-Min sketch plus a heavy-hitters heap for approximate top-k.
+• spacesaving: the Space-Saving algorithm, k counters with bounded error.
+
+Keys are hashed with blake2b over keyhash.key_bytes() rather than hash(),
+so sketches built in different processes (different PYTHONHASHSEED) can
+still be merged.
+"""
+
+import heapq
+import itertools
+import time
+from array import array
+from collections import Counter, defaultdict
+from hashlib import blake2b
+
+from keyhash import key_bytes
+
+# rough cost of one tracked key: dict slot, key object and int object
+_BYTES_PER_KEY = 128
+
+
+def _batch(iterable):
+    """
+    Pre-aggregate an iterable or mapping into {key: count}.
+    Counter counts plain iterables in C, so the per-key Python work of the
+    sketches below happens once per distinct key instead of once per event.
+    """
+    if hasattr(iterable, 'items'):
+        return iterable
+    return Counter(iterable)
+
+
+class _LazyMinHeap:
+    """
+    Min-heap over a {key: count} dict whose counts only grow.
+    Stale heap entries are skipped on read instead of being removed on write.
+    """
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.heap = []
+        # tie-breaker so keys of unorderable types are never compared
+        self.order = itertools.count()
+
+    def push(self, key):
+        heapq.heappush(self.heap, (self.counts[key], next(self.order), key))
+        if len(self.heap) > 4 * len(self.counts) + 64:
+            self.rebuild()
+
+    def rebuild(self):
+        order = self.order
+        self.heap = [(count, next(order), key)
+                     for key, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def min(self):
+        heap, counts = self.heap, self.counts
+        while heap:
+            count, _, key = heap[0]
+            if counts.get(key) == count:
+                return count, key
+            heapq.heappop(heap)
+        raise IndexError('min of empty heap')
+
+
+class BoundedCounter:
+    """
+    Common Counter-compatible surface. Subclasses implement `_add`,
+    `_estimate`, `_items` and `merge`.
+    """
+
+    mode = None
+
+    def __init__(self):
+        self._total = 0
+
+    def __getitem__(self, key):
+        return self._estimate(key)
+
+    def __setitem__(self, key, value):
+        # supports `c[key] += n`: the read-modify-write becomes an increment
+        delta = value - self._estimate(key)
+        if delta < 0:
+            raise ValueError(f'{self.mode} counters cannot be decremented')
+        if delta:
+            self._add(key, delta)
+
+    def __contains__(self, key):
+        return self._estimate(key) > 0
+
+    def __add__(self, other):
+        result = self.copy()
+        result.merge(other)
+        return result
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.most_common(5)!r}, ...)'
+
+    def update(self, iterable=None, **kwds):
+        batches = [kwds] if iterable is None else [_batch(iterable), kwds]
+        # check first, so a bad count leaves the counter untouched
+        for batch in batches:
+            if any(count < 0 for count in batch.values()):
+                raise ValueError(f'{self.mode} counters cannot be '
+                                 'decremented')
+        for batch in batches:
+            for key, count in batch.items():
+                if count:
+                    self._add(key, count)
+
+    def most_common(self, n=None):
+        items = sorted(self._items(), key=lambda kv: kv[1], reverse=True)
+        return items if n is None else items[:n]
+
+    def total(self):
+        return self._total
+
+    def copy(self):
+        result = type(self).__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result._copy_state()
+        return result
+
+
+class ExactCounter(BoundedCounter):
+    """
+    Exact counts, like defaultdict(int), but raises MemoryError instead of
+    silently growing past `capacity` distinct keys.
+    """
+
+    mode = 'exact'
+
+    def __init__(self, iterable=None, capacity=None, max_bytes=None):
+        super().__init__()
+        if capacity is None and max_bytes is not None:
+            capacity = max(1, max_bytes // _BYTES_PER_KEY)
+        self.capacity = capacity
+        self.counts = Counter()
+        if iterable is not None:
+            self.update(iterable)
+
+    def _copy_state(self):
+        self.counts = self.counts.copy()
+
+    def _reserve(self, new_keys):
+        """Raise before inserting `new_keys` keys would exceed capacity."""
+        if self.capacity is not None and \
+                len(self.counts) + new_keys > self.capacity:
+            raise MemoryError(
+                f'{len(self.counts) + new_keys} keys exceed capacity '
+                f'{self.capacity}; use mode="cms" or mode="spacesaving"')
+
+    def _add(self, key, count):
+        if key not in self.counts:
+            self._reserve(1)
+        self.counts[key] += count
+        self._total += count
+
+    def __setitem__(self, key, value):
+        # exact counts can go down too, as with defaultdict(int) or Counter
+        delta = value - self.counts.get(key, 0)
+        if delta:
+            self._add(key, delta)
+
+    def _estimate(self, key):
+        return self.counts.get(key, 0)
+
+    def _items(self):
+        return self.counts.items()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def update(self, iterable=None, **kwds):
+        batches = []
+        if iterable is not None:
+            # Counter counts a plain iterable in C
+            batches.append(iterable if hasattr(iterable, 'items')
+                           else Counter(iterable))
+        if kwds:
+            batches.append(kwds)
+        counts = self.counts
+        # check the whole batch first so a refused update changes nothing
+        self._reserve(len(set().union(*(batch.keys() - counts.keys()
+                                        for batch in batches))))
+        for batch in batches:
+            counts.update(batch)
+            self._total += sum(batch.values())
+
+    def most_common(self, n=None):
+        return self.counts.most_common(n)
+
+    def merge(self, other):
+        self._reserve(len(other.counts.keys() - self.counts.keys()))
+        self.counts.update(other.counts)
+        self._total += other._total
+        return self
+
+
+class CountMinCounter(BoundedCounter):
+    """
+    Count-Min sketch: `depth` rows of `width` counters in one array('Q').
+    Estimates never undercount; they overcount by at most e/width * total
+    with probability 1 - exp(-depth). The `top_k` heaviest keys seen are
+    tracked alongside so most_common() keeps working.
+    """
+
+    mode = 'cms'
+
+    def __init__(self, iterable=None, width=None, depth=4, top_k=100,
+                 max_bytes=1 << 20, seed=0):
+        super().__init__()
+        if width is None:
+            budget = max_bytes - top_k * _BYTES_PER_KEY
+            width = max(16, budget // (8 * depth))
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.seed = seed
+        self.table = array('Q', bytes(8 * width * depth))
+        self.top = {}
+        self._heap = _LazyMinHeap(self.top)
+        self._salt = seed.to_bytes(8, 'little')
+        if iterable is not None:
+            self.update(iterable)
+
+    def _copy_state(self):
+        self.table = array('Q', self.table)
+        self.top = dict(self.top)
+        self._heap = _LazyMinHeap(self.top)
+        self._heap.rebuild()
+
+    def _cells(self, key):
+        digest = blake2b(key_bytes(key), digest_size=16,
+                         salt=self._salt).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width
+                for row in range(self.depth)]
+
+    def _add(self, key, count):
+        table = self.table
+        estimate = None
+        for cell in self._cells(key):
+            value = table[cell] + count
+            table[cell] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        self._total += count
+        self._offer(key, estimate)
+
+    def _offer(self, key, estimate):
+        top = self.top
+        if key in top or len(top) < self.top_k:
+            top[key] = estimate
+            self._heap.push(key)
+            return
+        if not top:
+            return
+        low, low_key = self._heap.min()
+        if estimate > low:
+            del top[low_key]
+            top[key] = estimate
+            self._heap.push(key)
+
+    def _estimate(self, key):
+        table = self.table
+        return min(table[cell] for cell in self._cells(key))
+
+    def _items(self):
+        return self.top.items()
+
+    def merge(self, other):
+        if (self.width, self.depth, self.seed) != \
+                (other.width, other.depth, other.seed):
+            raise ValueError('can only merge sketches with the same '
+                             'width, depth and seed')
+        table = self.table
+        for i, value in enumerate(other.table):
+            if value:
+                table[i] += value
+        self._total += other._total
+        candidates = set(self.top) | set(other.top)
+        self.top.clear()
+        for key in candidates:
+            self._offer(key, self._estimate(key))
+        self._heap.rebuild()
+        return self
+
+
+class SpaceSavingCounter(BoundedCounter):
+    """
+    Space-Saving (Metwally et al.): at most `capacity` counters. A new key
+    evicts the smallest counter and inherits its count, so every key whose
+    true count exceeds total/capacity is guaranteed to be tracked, and each
+    estimate overcounts by at most `error(key)`.
+    """
+
+    mode = 'spacesaving'
+
+    def __init__(self, iterable=None, capacity=None, max_bytes=1 << 20):
+        super().__init__()
+        if capacity is None:
+            # counts and errors dicts, so two slots per key
+            capacity = max(1, max_bytes // (2 * _BYTES_PER_KEY))
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = _LazyMinHeap(self.counts)
+        if iterable is not None:
+            self.update(iterable)
+
+    def _copy_state(self):
+        self.counts = dict(self.counts)
+        self.errors = dict(self.errors)
+        self._heap = _LazyMinHeap(self.counts)
+        self._heap.rebuild()
+
+    def _add(self, key, count):
+        counts = self.counts
+        self._total += count
+        if key in counts:
+            counts[key] += count
+        elif len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+        else:
+            low, low_key = self._heap.min()
+            del counts[low_key], self.errors[low_key]
+            counts[key] = low + count
+            self.errors[key] = low
+        self._heap.push(key)
+
+    def _estimate(self, key):
+        return self.counts.get(key, 0)
+
+    def _items(self):
+        return self.counts.items()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def error(self, key):
+        return self.errors.get(key, 0)
+
+    def _floor(self):
+        if len(self.counts) < self.capacity:
+            return 0
+        return self._heap.min()[0]
+
+    def merge(self, other):
+        # Agarwal et al., "Mergeable Summaries": a key missing from one side
+        # may have had up to that side's minimum count
+        floor_a, floor_b = self._floor(), other._floor()
+        merged = []
+        for key in set(self.counts) | set(other.counts):
+            count = self.counts.get(key, floor_a) + other.counts.get(key, floor_b)
+            error = self.errors.get(key, floor_a) + other.errors.get(key, floor_b)
+            merged.append((count, error, key))
+        merged = heapq.nlargest(self.capacity, merged, key=lambda t: t[0])
+        self.counts.clear()
+        self.errors.clear()
+        for count, error, key in merged:
+            self.counts[key] = count
+            self.errors[key] = error
+        self._heap.rebuild()
+        self._total += other._total
+        return self
+
+
+MODES = {
+    'exact': ExactCounter,
+    'cms': CountMinCounter,
+    'spacesaving': SpaceSavingCounter,
+}
+
+
+def stats_counter(mode='exact', iterable=None, **kwds):
+    """
+    Build a counter for one of MODES.
+    Args:
+        mode: 'exact', 'cms' or 'spacesaving'.
+        iterable: optional initial events or {key: count} mapping.
+        kwds: memory budget, e.g. max_bytes=..., capacity=..., top_k=...
+    """
+    try:
+        factory = MODES[mode]
+    except KeyError:
+        raise ValueError(f'unknown mode {mode!r}, expected one of '
+                         f'{sorted(MODES)}') from None
+    return factory(iterable, **kwds)
+
+
+def zipf_events(n, keys, s=1.1, seed=0):
+    from random import Random
+    weights = [1 / (rank ** s) for rank in range(1, keys + 1)]
+    return Random(seed).choices(range(keys), weights, k=n)
+
+
+if __name__ == "__main__":
+    events = zipf_events(1_000_000, 200_000)
+    truth = Counter(events)
+
+    start_time = time.time()
+    stats = defaultdict(int)
+    for key in events:
+        stats[key] += 1
+    duration = time.time() - start_time
+    print(f"defaultdict(int) loop   {duration:.3f}s  {len(stats)} keys")
+
+    for mode, kwds in [('exact', {}),
+                       ('cms', {'max_bytes': 1 << 20, 'top_k': 20}),
+                       ('spacesaving', {'capacity': 2000})]:
+        start_time = time.time()
+        counter = stats_counter(mode, **kwds)
+        half = len(events) // 2
+        # two halves aggregated separately then merged, as workers would
+        counter.update(events[:half])
+        other = stats_counter(mode, **kwds)
+        other.update(events[half:])
+        counter.merge(other)
+        duration = time.time() - start_time
+        top = counter.most_common(10)
+        worst = max(abs(count - truth[key]) for key, count in top)
+        print(f"{mode:12} update+merge {duration:.3f}s  "
+              f"top10 max abs error {worst}")
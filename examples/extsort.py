@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+External merge sort for data bigger than RAM, the out-of-core version of
+`sorted(set(basket))` from data_structures.py.
+
+1. Read records until the memory budget is used, sort that run in memory
+   and write it to a temp file as length-prefixed records.
+2. k-way merge the runs with heapq.merge, which holds one record per run.
+   With more runs than `fan_in`, groups of runs are merged into bigger
+   runs first, so open files and their buffers stay bounded too.
+
+Memory use is about memory_limit + 2 * fan_in * buffer_size whatever the
+input size, so a 50 GB file sorts on a 4 GB box with e.g. memory_limit=2 GiB
+(about 25 runs, merged in a single pass).
+
+    python extsort.py big.txt big.sorted --memory 2G --unique
+"""
+
+import argparse
+import heapq
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from itertools import islice
+
+from spilltee import FORMATS
+
+_LENGTH = struct.Struct('<Q')
+# pointer in the run list plus object header, added to each record's size
+_OVERHEAD = 8 + sys.getsizeof(b'')
+
+
+def _record_size(record):
+    if isinstance(record, bytes):
+        return len(record) + _OVERHEAD
+    return sys.getsizeof(record) + 8
+
+
+class _Run:
+    """One sorted run spilled to an anonymous temp file."""
+
+    def __init__(self, records, encode, tmpdir, buffer_size):
+        self.file = tempfile.TemporaryFile(dir=tmpdir, buffering=buffer_size)
+        self.buffer_size = buffer_size
+        write = self.file.write
+        pack = _LENGTH.pack
+        for record in records:
+            payload = encode(record)
+            write(pack(len(payload)))
+            write(payload)
+        self.file.flush()
+
+    def read(self, decode):
+        f = self.file
+        f.seek(0)
+        read = f.read
+        unpack = _LENGTH.unpack
+        size = _LENGTH.size
+        while True:
+            header = read(size)
+            if not header:
+                return
+            yield decode(read(unpack(header)[0]))
+
+    def close(self):
+        self.file.close()
+
+
+def _dedup(records, key):
+    last = marker = object()
+    for record in records:
+        current = record if key is None else key(record)
+        if last is marker or current != last:
+            last = current
+            yield record
+
+
+def _sorted_runs(records, key, reverse, unique, memory_limit, encode,
+                 tmpdir, buffer_size):
+    it = iter(records)
+    while True:
+        run, used = [], 0
+        for record in it:
+            run.append(record)
+            used += _record_size(record)
+            if used >= memory_limit:
+                break
+        if not run:
+            return
+        run.sort(key=key, reverse=reverse)
+        if unique:
+            run = _dedup(run, key)
+        yield _Run(run, encode, tmpdir, buffer_size)
+        del run
+
+
+def external_sort(records, key=None, reverse=False, unique=False,
+                  memory_limit=256 << 20, format='pickle', tmpdir=None,
+                  fan_in=64, buffer_size=1 << 20):
+    """
+    Yield `records` in sorted order using bounded memory.
+    Args:
+        key, reverse: as for sorted().
+        unique: drop records whose key equals the previous record's key,
+            so with key=None the output is sorted(set(records)).
+        memory_limit: approximate bytes of records sorted in memory at once.
+        format: 'pickle' for any picklable record, 'bytes' for bytes
+            records (e.g. lines of a file) stored as raw records.
+        tmpdir: where the runs are spilled, default tempfile.gettempdir().
+        fan_in: most runs merged at once.
+    """
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2')
+    try:
+        encode, decode = FORMATS[format]
+    except KeyError:
+        raise ValueError(f'unknown format {format!r}, expected one of '
+                         f'{sorted(FORMATS)}') from None
+    def merge(group):
+        merged = heapq.merge(*(run.read(decode) for run in group),
+                             key=key, reverse=reverse)
+        return _dedup(merged, key) if unique else merged
+
+    def merge_front(runs):
+        # replace the oldest fan_in runs by one run holding all of them
+        group = runs[:fan_in]
+        runs[:fan_in] = [_Run(merge(group), encode, tmpdir, buffer_size)]
+        for run in group:
+            run.close()
+
+    runs = []
+    try:
+        for run in _sorted_runs(records, key, reverse, unique, memory_limit,
+                                encode, tmpdir, buffer_size):
+            runs.append(run)
+            # merge while reading, so open files never exceed 2 * fan_in
+            if len(runs) >= 2 * fan_in:
+                merge_front(runs)
+        while len(runs) > fan_in:
+            merge_front(runs)
+        yield from merge(runs)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def sort_file(src, dst, **kwds):
+    """
+    Sort the lines of `src` into `dst` as bytes, so no decoding is needed;
+    a missing newline on the last line is added.
+    """
+    kwds.setdefault('format', 'bytes')
+
+    def lines(f):
+        for line in f:
+            yield line if line.endswith(b'\n') else line + b'\n'
+
+    with open(src, 'rb') as f, open(dst, 'wb', buffering=1 << 20) as out:
+        out.writelines(external_sort(lines(f), **kwds))
+
+
+def parse_size(text):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='external merge sort of '
+                                                 'the lines of a file')
+    parser.add_argument('src', nargs='?')
+    parser.add_argument('dst', nargs='?')
+    parser.add_argument('--memory', default='256M', type=parse_size)
+    parser.add_argument('--unique', action='store_true')
+    parser.add_argument('--tmpdir')
+    parser.add_argument('--fan-in', type=int, default=64)
+    args = parser.parse_args()
+
+    if args.src:
+        sort_file(args.src, args.dst or args.src + '.sorted',
+                  memory_limit=args.memory, unique=args.unique,
+                  tmpdir=args.tmpdir, fan_in=args.fan_in)
+        sys.exit()
+
+    # demo: 1M random lines with a 4 MiB budget, i.e. dozens of runs
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = os.path.join(tmp, 'in.txt'), os.path.join(tmp, 'out.txt')
+        with open(src, 'w') as f:
+            for _ in range(1_000_000):
+                f.write(f'{rng.randrange(10**9):09d}\n')
+        start_time = time.time()
+        sort_file(src, dst, memory_limit=4 << 20, fan_in=16, unique=True)
+        duration = time.time() - start_time
+        with open(src, 'rb') as f:
+            expected = sorted(set(f))
+        with open(dst, 'rb') as f:
+            assert list(f) == expected
+        print(f"sorted {os.path.getsize(src) >> 20} MiB with a 4 MiB "
+              f"budget in {duration:.2f}s, {len(expected)} unique lines")
+        print(list(islice(external_sort([3, 1, 2, 3], unique=True), 5)))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Binary search in sorted files too big to load, the on-disk version of
+`bisect_left(x, 991234)` in data_structures.py.
+
+SortedFile maps the file with mmap and bisects byte offsets: each probe
+lands in the middle of some record, resyncs forward to the next record
+boundary (the byte after a newline, or a multiple of record_size for
+fixed-width files) and compares that record's key. A lookup touches
+O(log n) pages, which the OS reads on demand, so a 50 GB file answers in
+a few dozen page reads and the process memory stays flat.
+
+Records are bytes: lines without their newline, or fixed-width slices.
+key= extracts the sort key from a record (default: the whole record), and
+search keys are bytes too (str is encoded as UTF-8). The file must be
+sorted by that key in byte order, as `LC_ALL=C sort` or
+examples/extsort.py produce.
+
+    bisect_file('ids.txt', b'00991234')    # offset of the first record >= key
+    with SortedFile('ids.txt') as f:
+        f.find(b'00991234')                # the record, or None
+        list(f.range(b'0099', b'0100'))    # records with keys in [lo, hi)
+"""
+
+import mmap
+import os
+import random
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+
+
+def _as_bytes(key):
+    return key.encode('utf-8') if isinstance(key, str) else key
+
+
+class SortedFile:
+    """
+    Args:
+        path: the sorted file.
+        record_size: bytes per record for fixed-width files; None for lines.
+        key: function from record bytes to the sort key.
+    """
+
+    def __init__(self, path, record_size=None, key=None):
+        self.record_size = record_size
+        self.key = key
+        self.probes = 0
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ) if self.size else b''
+        if record_size is not None and self.size % record_size:
+            raise ValueError(f'{path}: size {self.size} is not a multiple of '
+                             f'record_size {record_size}')
+
+    def close(self):
+        if self.size:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record_key(self, record):
+        self.probes += 1
+        return record if self.key is None else self.key(record)
+
+    def _line_end(self, start):
+        end = self._mmap.find(b'\n', start)
+        return self.size if end < 0 else end
+
+    def _line_start(self, offset):
+        """First record boundary at or after offset."""
+        if offset == 0:
+            return 0
+        end = self._mmap.find(b'\n', offset - 1)
+        return self.size if end < 0 else end + 1
+
+    def _bisect_lines(self, key, right):
+        lo, hi = 0, self.size
+        # lo and hi are record boundaries; the answer lies in [lo, hi]
+        while lo < hi:
+            start = self._line_start((lo + hi) // 2)
+            if start >= hi:
+                # no boundary in the upper half: step over the record at lo
+                start = lo
+            end = self._line_end(start)
+            found = self._record_key(self._mmap[start:end])
+            if found < key or (right and found == key):
+                lo = min(end + 1, self.size)
+            else:
+                hi = start
+        return lo
+
+    def _bisect_fixed(self, key, right):
+        size = self.record_size
+        records = _FixedRecords(self._mmap, size, self.size // size)
+        search = bisect_right if right else bisect_left
+        return search(records, key, key=self._record_key) * size
+
+    def _bisect(self, key, right):
+        if self.record_size is None:
+            return self._bisect_lines(_as_bytes(key), right)
+        return self._bisect_fixed(_as_bytes(key), right)
+
+    def bisect_left(self, key):
+        """Offset of the first record whose key is >= key."""
+        return self._bisect(key, right=False)
+
+    def bisect_right(self, key):
+        """Offset of the first record whose key is > key."""
+        return self._bisect(key, right=True)
+
+    def records(self, start=0):
+        """Yield the records from byte offset `start` to the end."""
+        mm = self._mmap
+        if self.record_size is not None:
+            size = self.record_size
+            for offset in range(start, self.size, size):
+                yield mm[offset:offset + size]
+            return
+        while start < self.size:
+            end = self._line_end(start)
+            yield mm[start:end]
+            start = end + 1
+
+    def find(self, key):
+        """The first record with exactly this key, or None."""
+        key = _as_bytes(key)
+        record = next(self.records(self.bisect_left(key)), None)
+        if record is not None and self._record_key(record) == key:
+            return record
+        return None
+
+    def range(self, low, high=None):
+        """Records with low <= key < high (high=None: to the end)."""
+        high = _as_bytes(high)
+        for record in self.records(self.bisect_left(low)):
+            if high is not None and self._record_key(record) >= high:
+                return
+            yield record
+
+    def prefix(self, prefix):
+        """Records whose key starts with `prefix`."""
+        prefix = _as_bytes(prefix)
+        for record in self.records(self.bisect_left(prefix)):
+            if not self._record_key(record).startswith(prefix):
+                return
+            yield record
+
+
+class _FixedRecords:
+    def __init__(self, mm, size, count):
+        self.mm = mm
+        self.size = size
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = i * self.size
+        return self.mm[start:start + self.size]
+
+
+def bisect_file(path, key, record_size=None, key_func=None):
+    """Byte offset of the first record >= key in a sorted file."""
+    with SortedFile(path, record_size, key_func) as f:
+        return f.bisect_left(key)
+
+
+if __name__ == "__main__":
+    n = 2_000_000
+    rng = random.Random(0)
+    keys = sorted(rng.sample(range(10**9), n))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ids.txt')
+        with open(path, 'w') as f:
+            for key in keys:
+                f.write(f'{key:09d}\tpayload {key % 977}\n')
+        size_mb = os.path.getsize(path) >> 20
+        queries = [f'{key:09d}'.encode() for key in rng.sample(keys, 1000)]
+
+        def first_field(record):
+            return record.split(b'\t', 1)[0]
+
+        start_time = time.time()
+        with open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+        in_memory = [first_field(line) for line in lines if line]
+        for query in queries:
+            in_memory[bisect_left(in_memory, query)]
+        print(f"{n} lines ({size_mb} MiB): load + 1000 lookups in memory "
+              f"{time.time() - start_time:.3f}s")
+
+        with SortedFile(path, key=first_field) as f:
+            start_time = time.time()
+            for query in queries:
+                assert first_field(f.find(query)) == query
+            duration = time.time() - start_time
+            print(f"SortedFile: 1000 lookups {duration:.3f}s, "
+                  f"{f.probes / len(queries):.1f} records read per lookup")
+            low, high = b'500000000', b'500100000'
+            print(f"range({low.decode()}, {high.decode()}): "
+                  f"{sum(1 for _ in f.range(low, high))} records, "
+                  f"prefix 12345: {list(f.prefix(b'12345'))[:3]}")
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Probabilistic membership for keyspaces too big for a set (see the `in`
+tests on sets in data_structures.py).
+
+• BloomFilter: k bits per key in one bit array, no false negatives and a
+  configurable false-positive rate.
+• ScalableBloomFilter: a chain of Bloom filters that grows with the data
+  while keeping the overall false-positive rate bounded.
+• CuckooFilter: fingerprints in buckets of 4; supports delete().
+
+Bits live in a bytearray, or in a memory-mapped file when a path is given,
+so a filter can be bigger than RAM and reopened later. Filters built with
+the same parameters in different processes can be combined with union().
+"""
+
+import math
+import mmap
+import os
+import random
+import struct
+import tempfile
+import time
+from hashlib import blake2b
+
+from keyhash import key_bytes
+
+_HEADER = struct.Struct('<4sQQQQQQQ')
+# bytes of the table combined or counted per step, to bound the copies
+_CHUNK = 1 << 20
+
+
+def _hash(key, seed):
+    digest = blake2b(key_bytes(key), digest_size=16,
+                     salt=seed.to_bytes(8, 'little')).digest()
+    return (int.from_bytes(digest[:8], 'little'),
+            int.from_bytes(digest[8:], 'little'))
+
+
+class _Storage:
+    """
+    Header (magic, size, width, count, seed, and for a cuckoo filter the
+    stashed victim: present flag, index, fingerprint) followed by the
+    table, in a bytearray or a memory-mapped file.
+    """
+
+    def __init__(self, magic, nbytes, size, width, seed, path=None):
+        total = _HEADER.size + nbytes
+        if path is None:
+            self.buffer = bytearray(total)
+            self.file = None
+        else:
+            self.file = open(path, 'w+b')
+            self.file.truncate(total)
+            self.buffer = mmap.mmap(self.file.fileno(), total)
+        self.magic = magic
+        self.size, self.width, self.count, self.seed = size, width, 0, seed
+        self.victim = None
+        self.table = memoryview(self.buffer)[_HEADER.size:]
+
+    @classmethod
+    def open(cls, magic, path):
+        storage = cls.__new__(cls)
+        storage.file = open(path, 'r+b')
+        storage.buffer = mmap.mmap(storage.file.fileno(), 0)
+        (found, storage.size, storage.width, storage.count, storage.seed,
+         present, index, fingerprint) = _HEADER.unpack_from(storage.buffer)
+        storage.victim = (index, fingerprint) if present else None
+        if found != magic:
+            raise ValueError(f'{path} is not a {magic.decode()} file')
+        storage.magic = magic
+        storage.table = memoryview(storage.buffer)[_HEADER.size:]
+        return storage
+
+    def flush(self):
+        present, index, fingerprint = (1, *self.victim) if self.victim \
+            else (0, 0, 0)
+        _HEADER.pack_into(self.buffer, 0, self.magic, self.size, self.width,
+                          self.count, self.seed, present, index, fingerprint)
+        if self.file is not None:
+            self.buffer.flush()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.table.release()
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+
+
+class BloomFilter:
+    """
+    Args:
+        capacity: number of keys the filter is sized for.
+        error_rate: false-positive rate at capacity.
+        path: back the bits by this file through mmap.
+    """
+
+    MAGIC = b'BLM2'
+
+    def __init__(self, capacity, error_rate=0.01, path=None, seed=0):
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+        bits = max(8, math.ceil(-capacity * math.log(error_rate)
+                                / math.log(2) ** 2))
+        hashes = max(1, round(bits / max(capacity, 1) * math.log(2)))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.storage = _Storage(self.MAGIC, (bits + 7) // 8, bits, hashes,
+                                seed, path)
+
+    @classmethod
+    def open(cls, path):
+        bloom = cls.__new__(cls)
+        bloom.storage = _Storage.open(cls.MAGIC, path)
+        bloom.capacity = bloom.error_rate = None
+        return bloom
+
+    @property
+    def bits(self):
+        return self.storage.size
+
+    @property
+    def hashes(self):
+        return self.storage.width
+
+    def __len__(self):
+        return self.storage.count
+
+    def __repr__(self):
+        return (f'BloomFilter({len(self)} keys, {self.bits} bits, '
+                f'{self.hashes} hashes)')
+
+    def _positions(self, h1, h2):
+        bits = self.storage.size
+        return [(h1 + i * h2) % bits for i in range(self.storage.width)]
+
+    def _add_hashed(self, h1, h2):
+        table = self.storage.table
+        present = True
+        for position in self._positions(h1, h2):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not table[byte] & mask:
+                present = False
+                table[byte] |= mask
+        if not present:
+            self.storage.count += 1
+        return present
+
+    def _has_hashed(self, h1, h2):
+        table = self.storage.table
+        return all(table[p >> 3] & (1 << (p & 7))
+                   for p in self._positions(h1, h2))
+
+    def add(self, key):
+        """Add `key`; return True if it was (probably) present already."""
+        return self._add_hashed(*_hash(key, self.storage.seed))
+
+    def update(self, keys):
+        seed = self.storage.seed
+        add = self._add_hashed
+        for key in keys:
+            add(*_hash(key, seed))
+
+    def __contains__(self, key):
+        return self._has_hashed(*_hash(key, self.storage.seed))
+
+    def contains_many(self, keys):
+        seed = self.storage.seed
+        has = self._has_hashed
+        return [has(*_hash(key, seed)) for key in keys]
+
+    def union(self, other):
+        """OR in a filter built with the same size, hashes and seed."""
+        mine, theirs = self.storage, other.storage
+        if (mine.size, mine.width, mine.seed) != \
+                (theirs.size, theirs.width, theirs.seed):
+            raise ValueError('can only union filters with the same '
+                             'parameters')
+        # a big-int OR per chunk runs in C instead of a Python loop over
+        # bytes, and copies only _CHUNK bytes at a time of mmap tables
+        table, other_table = mine.table, theirs.table
+        for start in range(0, len(table), _CHUNK):
+            stop = min(start + _CHUNK, len(table))
+            merged = int.from_bytes(table[start:stop], 'little') \
+                | int.from_bytes(other_table[start:stop], 'little')
+            table[start:stop] = merged.to_bytes(stop - start, 'little')
+        # an estimate: keys added to both filters are counted twice
+        mine.count += theirs.count
+        return self
+
+    def fill_ratio(self):
+        table = self.storage.table
+        ones = sum(int.from_bytes(table[start:start + _CHUNK],
+                                  'little').bit_count()
+                   for start in range(0, len(table), _CHUNK))
+        return ones / self.bits
+
+    def flush(self):
+        self.storage.flush()
+
+    def close(self):
+        self.storage.close()
+
+
+class ScalableBloomFilter:
+    """
+    Almeida et al., "Scalable Bloom Filters": when the current filter is
+    full a new one `growth` times larger is added with its error rate
+    multiplied by `tightening`, so the total stays below error_rate.
+    """
+
+    def __init__(self, initial_capacity=1000, error_rate=0.01, growth=2,
+                 tightening=0.9, seed=0):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.seed = seed
+        self.filters = []
+        self._grow()
+
+    def _grow(self):
+        i = len(self.filters)
+        self.filters.append(BloomFilter(
+            self.initial_capacity * self.growth ** i,
+            self.error_rate * (1 - self.tightening) * self.tightening ** i,
+            seed=self.seed))
+
+    def __len__(self):
+        return sum(len(f) for f in self.filters)
+
+    def __contains__(self, key):
+        # every filter shares the seed, so the key is hashed only once
+        hashed = _hash(key, self.seed)
+        return any(f._has_hashed(*hashed) for f in reversed(self.filters))
+
+    def add(self, key):
+        hashed = _hash(key, self.seed)
+        if any(f._has_hashed(*hashed) for f in reversed(self.filters)):
+            return True
+        last = self.filters[-1]
+        if len(last) >= last.capacity:
+            self._grow()
+            last = self.filters[-1]
+        last._add_hashed(*hashed)
+        return False
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def contains_many(self, keys):
+        return [key in self for key in keys]
+
+    def union(self, other):
+        """
+        OR together the filters at the same position of both chains, which
+        have the same parameters; extra filters of `other` are copied.
+        """
+        for i, theirs in enumerate(other.filters):
+            if i == len(self.filters):
+                self._grow()
+            self.filters[i].union(theirs)
+        return self
+
+
+class CuckooFilter:
+    """
+    Fan et al., "Cuckoo Filter": a key's fingerprint lives in one of two
+    buckets, i1 = hash(key) and i2 = i1 ^ hash(fingerprint), so it can be
+    moved and deleted without knowing the key.
+    Args:
+        capacity: number of keys; the table is sized for 95% load.
+        error_rate: picks 8, 16 or 32 bit fingerprints.
+    """
+
+    MAGIC = b'CKO2'
+    BUCKET = 4
+    MAX_KICKS = 500
+
+    def __init__(self, capacity, error_rate=0.001, path=None, seed=0):
+        needed = math.log2(2 * self.BUCKET / error_rate)
+        width = next((w for w in (1, 2, 4) if 8 * w >= needed), 4)
+        buckets = 1
+        while buckets * self.BUCKET * 0.95 < capacity:
+            buckets *= 2
+        self.storage = _Storage(self.MAGIC, buckets * self.BUCKET * width,
+                                buckets, width, seed, path)
+        self._setup()
+
+    @classmethod
+    def open(cls, path):
+        cuckoo = cls.__new__(cls)
+        cuckoo.storage = _Storage.open(cls.MAGIC, path)
+        cuckoo._setup()
+        return cuckoo
+
+    def _setup(self):
+        storage = self.storage
+        self.slots = storage.table.cast({1: 'B', 2: 'H', 4: 'I'}
+                                        [storage.width])
+        self.mask = storage.size - 1
+        self.fp_mask = (1 << (8 * storage.width)) - 1
+        self.victim = storage.victim
+        self.rng = random.Random(storage.seed)
+
+    def __len__(self):
+        return self.storage.count
+
+    def __repr__(self):
+        return (f'CuckooFilter({len(self)} keys, {self.storage.size} '
+                f'buckets, {8 * self.storage.width}-bit fingerprints)')
+
+    def _locate(self, key):
+        h1, h2 = _hash(key, self.storage.seed)
+        fingerprint = (h2 & self.fp_mask) or 1
+        return h1 & self.mask, fingerprint
+
+    def _alternate(self, index, fingerprint):
+        return (index ^ (fingerprint * 0x5bd1e995)) & self.mask
+
+    def _bucket(self, index):
+        start = index * self.BUCKET
+        return range(start, start + self.BUCKET)
+
+    def _place(self, index, fingerprint):
+        slots = self.slots
+        for slot in self._bucket(index):
+            if not slots[slot]:
+                slots[slot] = fingerprint
+                return True
+        return False
+
+    def _insert(self, index, fingerprint):
+        if self.victim is not None:
+            return False
+        if self._place(index, fingerprint) or \
+                self._place(self._alternate(index, fingerprint), fingerprint):
+            return True
+        slots = self.slots
+        index = self.rng.choice((index, self._alternate(index, fingerprint)))
+        for _ in range(self.MAX_KICKS):
+            slot = index * self.BUCKET + self.rng.randrange(self.BUCKET)
+            fingerprint, slots[slot] = slots[slot], fingerprint
+            index = self._alternate(index, fingerprint)
+            if self._place(index, fingerprint):
+                return True
+        # keep the homeless fingerprint so nothing is lost; the filter is
+        # full from now on
+        self.victim = (index, fingerprint)
+        return True
+
+    def add(self, key):
+        """Add `key`; raises MemoryError once the table is full."""
+        if not self._insert(*self._locate(key)):
+            raise MemoryError('cuckoo filter is full')
+        self.storage.count += 1
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def _find(self, index, fingerprint):
+        slots = self.slots
+        for bucket in (index, self._alternate(index, fingerprint)):
+            for slot in self._bucket(bucket):
+                if slots[slot] == fingerprint:
+                    return slot
+        return None
+
+    def __contains__(self, key):
+        index, fingerprint = self._locate(key)
+        if self._find(index, fingerprint) is not None:
+            return True
+        victim = self.victim
+        return victim is not None and victim[1] == fingerprint and \
+            victim[0] in (index, self._alternate(index, fingerprint))
+
+    def contains_many(self, keys):
+        return [key in self for key in keys]
+
+    def delete(self, key):
+        """Remove one copy of `key`; only delete keys that were added."""
+        index, fingerprint = self._locate(key)
+        slot = self._find(index, fingerprint)
+        if slot is not None:
+            self.slots[slot] = 0
+        elif self.victim is not None and self.victim[1] == fingerprint and \
+                self.victim[0] in (index, self._alternate(index, fingerprint)):
+            self.victim = None
+        else:
+            return False
+        self.storage.count -= 1
+        if self.victim is not None:
+            # room was made, so try to re-home the stashed fingerprint
+            index, fingerprint = self.victim
+            self.victim = None
+            self._insert(index, fingerprint)
+        return True
+
+    def union(self, other):
+        """Insert every fingerprint of a filter with the same parameters."""
+        if (self.storage.size, self.storage.width, self.storage.seed) != \
+                (other.storage.size, other.storage.width, other.storage.seed):
+            raise ValueError('can only union filters with the same '
+                             'parameters')
+        stored = [(slot // self.BUCKET, fingerprint)
+                  for slot, fingerprint in enumerate(other.slots)
+                  if fingerprint]
+        if other.victim is not None:
+            stored.append(other.victim)
+        for index, fingerprint in stored:
+            if not self._insert(index, fingerprint):
+                raise MemoryError('cuckoo filter is full')
+            self.storage.count += 1
+        return self
+
+    def flush(self):
+        self.storage.victim = self.victim
+        self.storage.flush()
+
+    def close(self):
+        self.storage.victim = self.victim
+        self.slots.release()
+        self.storage.close()
+
+
+def false_positive_rate(filter_, n):
+    probes = range(n, 2 * n)
+    return sum(filter_.contains_many(probes)) / n
+
+
+if __name__ == "__main__":
+    n = 200_000
+    keys = range(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make in [
+                ('BloomFilter', lambda: BloomFilter(n, 0.01)),
+                ('BloomFilter (mmap)',
+                 lambda: BloomFilter(n, 0.01, os.path.join(tmp, 'b.bloom'))),
+                ('ScalableBloomFilter',
+                 lambda: ScalableBloomFilter(1000, 0.01)),
+                ('CuckooFilter', lambda: CuckooFilter(n, 0.001))]:
+            filter_ = make()
+            start_time = time.time()
+            filter_.update(keys)
+            duration = time.time() - start_time
+            assert all(filter_.contains_many(keys))
+            rate = false_positive_rate(filter_, n)
+            print(f"{name:20} add {n} keys {duration:.2f}s, "
+                  f"false positives {rate:.4%}")
+            if hasattr(filter_, 'close'):
+                filter_.close()
+
+    # two halves built separately, e.g. by two worker processes
+    left, right = BloomFilter(n, 0.01), BloomFilter(n, 0.01)
+    left.update(range(0, n, 2))
+    right.update(range(1, n, 2))
+    left.union(right)
+    print(f"union of halves: all present {all(left.contains_many(keys))}, "
+          f"set would need ~{n * 60 / 2**20:.0f} MiB, "
+          f"filter uses {left.bits / 8 / 2**20:.2f} MiB")
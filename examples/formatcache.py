@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Compiled str.format templates for the format calls of string.py:
+
+    '{1} and {0}'.format('spam', 'eggs')
+    'Jack: {0[Jack]:d}; Sjoerd: {0[Sjoerd]:d}'.format(table)
+    'Jack: {Jack:d}; Sjoerd: {Sjoerd:d}'.format(**table)
+
+str.format parses its template on every call. compile_format(template)
+parses it once with string.Formatter.parse and generates two functions
+around a single f-string, which the interpreter formats without parsing,
+with positions and keyword fields bound as parameters:
+
+    format(_0, _1, *_args, **_mapping)   f"{_1} and {_0}"
+    format_map(_mapping)                 f"Jack: {_mapping['Jack']:d}; ..."
+
+Field names, indexes ([Jack], [0]), attributes (.real), conversions
+(!r, !s, !a) and nested specs ({:{width}.{precision}f}) follow the
+str.format rules, except that a missing positional argument raises
+TypeError rather than IndexError; a missing keyword raises KeyError, as
+str.format does. Compiled templates are kept in an LRU
+cache keyed by the template; code that formats the same few templates
+millions of times should still hold on to the compiled .format, since the
+cache lookup costs about as much as the parse it saves.
+
+printf-style templates, '%5.3f' % x, are parsed in C on each call and
+have no nesting or field lookups to specialize; bind template.__mod__ once
+and map it over the values, as examples/tablewriter.py does.
+"""
+
+import re
+import string
+import time
+from functools import lru_cache
+from keyword import iskeyword
+
+# text that can sit inside generated f"..." source as it is: printable,
+# no double quote, no backslash (f-string parts cannot hold one before 3.12)
+_SOURCE_SAFE = re.compile(r'[^"\\]*')
+_NAME_PART = re.compile(r'[^.[]*')
+_CACHE_SIZE = 1024
+
+
+class _Missing:
+    """
+    Default of a keyword parameter: any use of it in the f-string raises
+    KeyError(name), as str.format does for a missing keyword.
+    """
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        raise KeyError(self.name)
+
+    __str__ = __repr__
+
+    def __format__(self, spec):
+        raise KeyError(self.name)
+
+    def __getattr__(self, attribute):
+        raise KeyError(self.name)
+
+    __getitem__ = __getattr__
+
+
+def _split_field_name(field_name):
+    """
+    (first, [(is_attribute, key), ...]) for 'name.attr[key]', as str.format
+    splits a field name; decimal parts become ints.
+    """
+    first = _NAME_PART.match(field_name).group()
+    pos = len(first)
+    if first.isdecimal():
+        first = int(first)
+    rest = []
+    while pos < len(field_name):
+        if field_name[pos] == '.':
+            key = _NAME_PART.match(field_name, pos + 1).group()
+            if not key:
+                raise ValueError('Empty attribute in format string')
+            rest.append((True, key))
+            pos += 1 + len(key)
+        elif field_name[pos] == '[':
+            stop = field_name.find(']', pos)
+            if stop < 0:
+                raise ValueError("Missing ']' in format string")
+            key = field_name[pos + 1:stop]
+            if not key:
+                raise ValueError('Empty attribute in format string')
+            rest.append((False, int(key) if key.isdecimal() else key))
+            pos = stop + 1
+        else:
+            raise ValueError("Only '.' or '[' may follow ']' in format "
+                             "field specifier")
+    return first, rest
+
+
+class CompiledFormat:
+    """
+    A template parsed once.
+    Attributes:
+        template: the str.format template.
+        format: function(*args, **mapping), like template.format.
+        format_map: function(mapping), like template.format_map.
+        source: the generated code, for inspection.
+    """
+
+    def __init__(self, template, format, format_map, source):
+        self.template = template
+        self.format = format
+        self.format_map = format_map
+        self.source = source
+
+    def __repr__(self):
+        return f'CompiledFormat({self.template!r})'
+
+
+class _Builder:
+    """
+    Turns Formatter.parse output into f-string source. With by_name,
+    fields read parameters (_0, _1 ... for positions, the names for
+    keywords); otherwise they read mapping[key].
+    """
+
+    def __init__(self, constants, by_name):
+        self.constants = constants
+        self.by_name = by_name
+        self.next_index = 0
+        self.numbering = None       # 'auto' or 'manual' once decided
+        self.positions = 0          # 1 + the highest position used
+        self.names = []             # keyword fields bound as parameters
+
+    def constant(self, value):
+        """Source for `value`, inline when safe, else a bound name."""
+        if isinstance(value, int):
+            return repr(value)
+        if value.isprintable() and _SOURCE_SAFE.fullmatch(value) \
+                and "'" not in value:
+            return repr(value)
+        name = f'_c{len(self.constants)}'
+        self.constants[name] = value
+        return name
+
+    def text(self, value):
+        """value as literal f-string text."""
+        if value.isprintable() and _SOURCE_SAFE.fullmatch(value):
+            return value.replace('{', '{{').replace('}', '}}')
+        return f'{{{self.constant(value)}}}'
+
+    def argument(self, first):
+        if first == '':
+            if self.numbering == 'manual':
+                raise ValueError('cannot switch from manual field '
+                                 'specification to automatic field numbering')
+            self.numbering = 'auto'
+            first = self.next_index
+            self.next_index += 1
+        elif isinstance(first, int):
+            if self.numbering == 'auto':
+                raise ValueError('cannot switch from automatic field '
+                                 'numbering to manual field specification')
+            self.numbering = 'manual'
+        if isinstance(first, int):
+            self.positions = max(self.positions, first + 1)
+            return f'_{first}'
+        if self.by_name and first.isidentifier() \
+                and not first.startswith('_') and not iskeyword(first):
+            if first not in self.names:
+                self.names.append(first)
+            return first
+        return f'_mapping[{self.constant(first)}]'
+
+    def field(self, field_name):
+        first, rest = _split_field_name(field_name)
+        expression = self.argument(first)
+        for is_attribute, key in rest:
+            if not is_attribute:
+                expression += f'[{self.constant(key)}]'
+            elif key.isidentifier():
+                expression += f'.{key}'
+            else:
+                expression = f'getattr({expression}, {self.constant(key)})'
+        return expression
+
+    def source(self, template, depth=1):
+        if depth < 0:
+            raise ValueError('Max string recursion exceeded')
+        parts = []
+        for literal, field_name, spec, conversion in \
+                string.Formatter().parse(template):
+            if literal:
+                parts.append(self.text(literal))
+            if field_name is None:
+                continue
+            part = '{' + self.field(field_name)
+            if conversion is not None:
+                if conversion not in ('r', 's', 'a'):
+                    raise ValueError(f'Unknown conversion specifier '
+                                     f'{conversion}')
+                part += '!' + conversion
+            if spec:
+                part += ':' + self.spec(spec, depth)
+            parts.append(part + '}')
+        return ''.join(parts)
+
+    def spec(self, spec, depth):
+        if '{' in spec:
+            # nested fields become nested f-string replacement fields
+            return self.source(spec, depth - 1)
+        if spec.isprintable() and _SOURCE_SAFE.fullmatch(spec):
+            return spec
+        return f'{{{self.constant(spec)}}}'
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def compile_format(template):
+    """
+    The CompiledFormat for `template`; the last _CACHE_SIZE templates are
+    cached (see compile_format.cache_info()). Raises ValueError for a
+    malformed template, as str.format would at call time.
+    """
+    constants = {}
+    by_name = _Builder(constants, by_name=True)
+    body = by_name.source(template)
+    parameters = [f'_{i}' for i in range(by_name.positions)] + ['*_args']
+    for name in by_name.names:
+        constants[f'_m_{name}'] = _Missing(name)
+        parameters.append(f'{name}=_m_{name}')
+    parameters.append('**_mapping')
+    source = (f"def format({', '.join(parameters)}):\n"
+              f"    return f\"{body}\"\n")
+    by_key = _Builder(constants, by_name=False)
+    body = by_key.source(template)
+    if by_key.positions:
+        # str.format_map has no positional arguments either
+        source += ("def format_map(_mapping):\n"
+                   "    raise ValueError('Format string contains positional "
+                   "fields')\n")
+    else:
+        source += (f"def format_map(_mapping):\n"
+                   f"    return f\"{body}\"\n")
+    namespace = dict(constants)
+    exec(source, namespace)
+    return CompiledFormat(template, namespace['format'],
+                          namespace['format_map'], source)
+
+
+if __name__ == "__main__":
+    table = {'Sjoerd': 4127, 'Jack': 4098, 'Dcab': 8637678}
+    yes_votes = 42_572_654
+    percentage = yes_votes / (yes_votes + 43_132_495)
+    cases = [
+        ('{1} and {0}', ('spam', 'eggs'), {}),
+        ('Jack: {0[Jack]:d}; Sjoerd: {0[Sjoerd]:d}; Dcab: {0[Dcab]:d}',
+         (table,), {}),
+        ('Jack: {Jack:d}; Sjoerd: {Sjoerd:d}; Dcab: {Dcab:d}', (), table),
+        ('{:-9} YES votes  {:2.2%}', (yes_votes, percentage), {}),
+        ('This {food!r} is {adjective:>{width}}.', (),
+         {'food': 'spam', 'adjective': 'horrible', 'width': 12}),
+    ]
+    n = 1_000_000
+
+    def bench(fn, *args, **kwargs):
+        start_time = time.time()
+        for _ in range(n):
+            fn(*args, **kwargs)
+        return time.time() - start_time
+
+    for template, args, kwargs in cases:
+        compiled = compile_format(template)
+        expected = template.format(*args, **kwargs)
+        assert compiled.format(*args, **kwargs) == expected
+        print(repr(expected))
+        builtin = bench(template.format, *args, **kwargs)
+        precompiled = bench(compiled.format, *args, **kwargs)
+        cached = bench(lambda: compile_format(template).format(*args,
+                                                               **kwargs))
+        print(f"  {n} calls: str.format {builtin:.3f}s, compiled "
+              f"{precompiled:.3f}s, compile_format(t).format {cached:.3f}s")
+        if not args:
+            assert compiled.format_map(kwargs) == expected
+            builtin = bench(template.format_map, kwargs)
+            precompiled = bench(compiled.format_map, kwargs)
+            print(f"  format_map: str {builtin:.3f}s, compiled "
+                  f"{precompiled:.3f}s")
+    print(compile_format.cache_info())
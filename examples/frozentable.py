@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Static lookup tables like `chile_ranks = {'ghost': 1, ...}` frozen into a
+minimal perfect hash file (E.P.1 i7).
+
+A pickled dict with millions of entries must be unpickled at startup,
+which builds every key and value object and rehashes them all; the cost is
+paid by every process. build() instead writes one file that FrozenTable
+maps with mmap: opening it takes microseconds, the pages are shared by
+all processes through the page cache, and a lookup creates only the
+objects it returns.
+
+The hash is CHD (compress, hash and displace): keys are grouped in buckets
+of about _BUCKET_SIZE; each bucket stores a displacement pair (d0, d1),
+chosen at build time so that slot = (f1 + d0 * f2 + d1) % n puts every key
+in its own slot, n slots for n keys. A bucket that fits nowhere makes
+build() start over with hash functions salted differently; the salt is
+stored in the header.
+
+Keys and values are stored in the order-preserving encoding of
+examples/keycodec.py (None, bool, int, float, str, bytes and tuples of
+those; bools come back as ints). That encoding is prefix-free, so one
+offset per slot is enough: a record that starts with the encoded key holds
+that key, its value follows, and any other key is rejected.
+
+File layout, in native byte order:
+    header    magic, n, buckets, salt of the hash functions
+    d0, d1    array('I') of `buckets` displacements each
+    offsets   array('Q') of n + 1 offsets into the records
+    records   encoded key then encoded value for each slot
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import pickle
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from collections.abc import Mapping
+
+from keycodec import decode_value, encode_value
+
+_HEADER = struct.Struct('=8sQQQ')
+_MAGIC = b'CHDTABLE'
+_BUCKET_SIZE = 2
+_HASHES = struct.Struct('<QQQ')
+# displacements tried per bucket before giving up on the current hash
+# functions, and how many salted hash functions build() tries in all
+_MAX_TRIES = 10_000
+_MAX_SALTS = 64
+
+
+def _hashes(encoded, salt):
+    return _HASHES.unpack(hashlib.blake2b(
+        encoded, digest_size=24, salt=salt.to_bytes(8, 'little')).digest())
+
+
+def _place(buckets, n, rng):
+    """
+    Displacements per bucket and the slot of each key, or None when some
+    bucket fits nowhere: two of its keys may share f1 and f2 modulo n, and
+    then no displacement separates them.
+    """
+    d0 = array('I', bytes(4 * len(buckets)))
+    d1 = array('I', bytes(4 * len(buckets)))
+    slot_of = [0] * sum(map(len, buckets))
+    taken = bytearray(n)
+    free = None
+    rand = rng.random
+    # big buckets first, while the table is still mostly empty
+    order = sorted(range(len(buckets)), key=lambda b: -len(buckets[b]))
+    for b in order:
+        bucket = buckets[b]
+        if not bucket:
+            continue
+        if len(bucket) == 1:
+            # any free slot works: solve for d1 with d0 = 0
+            if free is None:
+                free = [slot for slot in range(n) if not taken[slot]]
+            slot = free.pop()
+            index, f1, _ = bucket[0]
+            d1[b] = (slot - f1) % n
+            taken[slot] = 1
+            slot_of[index] = slot
+            continue
+        for _ in range(_MAX_TRIES):
+            a, c = int(rand() * n), int(rand() * n)
+            slots = {(f1 + a * f2 + c) % n for _, f1, f2 in bucket}
+            if len(slots) == len(bucket) and not any(map(taken.__getitem__,
+                                                         slots)):
+                break
+        else:
+            return None
+        d0[b], d1[b] = a, c
+        for index, f1, f2 in bucket:
+            slot = (f1 + a * f2 + c) % n
+            taken[slot] = 1
+            slot_of[index] = slot
+    return d0, d1, slot_of
+
+
+def build(mapping, path, seed=0):
+    """Write `mapping` to `path` as a table for FrozenTable."""
+    keys = [encode_value(key) for key in mapping]
+    values = [encode_value(value) for value in mapping.values()]
+    n = len(keys)
+    count = max(1, math.ceil(n / _BUCKET_SIZE))
+    rng = random.Random(seed)
+    for salt in range(_MAX_SALTS):
+        buckets = [[] for _ in range(count)]
+        for index, key in enumerate(keys):
+            h0, f1, f2 = _hashes(key, salt)
+            buckets[h0 % count].append((index, f1, f2))
+        placed = _place(buckets, max(n, 1), rng)
+        if placed is not None:
+            break
+    else:
+        raise ValueError(f'no perfect hash found in {_MAX_SALTS} attempts')
+    d0, d1, slot_of = placed
+
+    by_slot = [0] * n
+    for index, slot in enumerate(slot_of):
+        by_slot[slot] = index
+    offsets = array('Q', [0])
+    position = 0
+    for index in by_slot:
+        position += len(keys[index]) + len(values[index])
+        offsets.append(position)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, n, count, salt))
+        d0.tofile(f)
+        d1.tofile(f)
+        # align the offsets for the memoryview cast
+        f.write(bytes(-f.tell() % 8))
+        offsets.tofile(f)
+        for index in by_slot:
+            f.write(keys[index])
+            f.write(values[index])
+
+
+class FrozenTable(Mapping):
+    """Read-only mapping over a file written by build()."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n, buckets, self._salt = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a frozen table')
+        self._view = view = memoryview(self._mmap)
+        start = _HEADER.size
+        self._d0 = view[start:start + 4 * buckets].cast('I')
+        start += 4 * buckets
+        self._d1 = view[start:start + 4 * buckets].cast('I')
+        start += 4 * buckets
+        start += -start % 8
+        self._offsets = view[start:start + 8 * (self.n + 1)].cast('Q')
+        # records are sliced from the mmap, which gives bytes to decode
+        self._base = start + 8 * (self.n + 1)
+        self._buckets = buckets
+
+    def _slot(self, encoded):
+        h0, f1, f2 = _hashes(encoded, self._salt)
+        b = h0 % self._buckets
+        return (f1 + self._d0[b] * f2 + self._d1[b]) % self.n
+
+    def _record(self, slot):
+        base = self._base
+        return self._mmap[base + self._offsets[slot]:
+                          base + self._offsets[slot + 1]]
+
+    def __getitem__(self, key):
+        try:
+            encoded = encode_value(key)
+        except TypeError:
+            raise KeyError(key) from None
+        if self.n:
+            record = self._record(self._slot(encoded))
+            if record.startswith(encoded):
+                return decode_value(record, len(encoded))[0]
+        raise KeyError(key)
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for slot in range(self.n):
+            yield decode_value(self._record(slot), 0)[0]
+
+    def close(self):
+        for view in (self._d0, self._d1, self._offsets, self._view):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _rss():
+    """(private, file-backed) resident bytes, Linux only."""
+    with open('/proc/self/statm') as f:
+        resident, shared = map(int, f.read().split()[1:3])
+    return (resident - shared) * mmap.PAGESIZE, shared * mmap.PAGESIZE
+
+
+def _load_and_probe(kind, path, keys):
+    """Child process: load the table, look up `keys`, report time and RSS."""
+    before = _rss()
+    start_time = time.time()
+    if kind == 'pickle':
+        with open(path, 'rb') as f:
+            table = pickle.load(f)
+    else:
+        table = FrozenTable(path)
+    loaded = time.time() - start_time
+    for key in keys:
+        table[key]
+    probed = time.time() - start_time - loaded
+    private, shared = (after - start for after, start in zip(_rss(), before))
+    print(f"{kind:7} load {loaded * 1000:9.3f} ms, {len(keys)} lookups "
+          f"{probed:.3f}s, RSS +{private / 2**20:.1f} MiB private, "
+          f"+{shared / 2**20:.1f} MiB shared page cache")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--probe':
+        _load_and_probe(sys.argv[2], sys.argv[3],
+                        [f'item{i}' for i in range(0, 1_000_000, 100)])
+        sys.exit()
+
+    n = 1_000_000
+    table = {f'item{i}': (i, f'name {i}') for i in range(n)}
+    with tempfile.TemporaryDirectory() as tmp:
+        table_path = os.path.join(tmp, 'table.chd')
+        pickle_path = os.path.join(tmp, 'table.pickle')
+        start_time = time.time()
+        build(table, table_path)
+        print(f"built {n} entries in {time.time() - start_time:.2f}s")
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(table, f, pickle.HIGHEST_PROTOCOL)
+        print(f"file sizes: table {os.path.getsize(table_path) >> 20} MiB, "
+              f"pickle {os.path.getsize(pickle_path) >> 20} MiB")
+
+        with FrozenTable(table_path) as frozen:
+            assert len(frozen) == n and 'missing' not in frozen
+            assert all(frozen[key] == table[key]
+                       for key in random.Random(0).sample(list(table), 1000))
+
+        for kind, path in (('pickle', pickle_path), ('table', table_path)):
+            subprocess.run([sys.executable, __file__, '--probe', kind, path],
+                           check=True)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Measure the performance claims made in the comments of data_structures.py.
+
+Each idiom is a case with two or more variants doing the same work; every
+variant runs at every input size and is reported with its best wall time
+and its tracemalloc peak, so choices in hot paths rest on numbers.
+
+    python idiom_bench.py                    # all cases, default sizes
+    python idiom_bench.py -s 1000 100000 -c deque bisect
+"""
+
+import argparse
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import deque
+
+CASES = {}
+
+
+def case(name, claim):
+    """Register a function returning {variant: func(n)} for `name`."""
+    def decorator(make_variants):
+        CASES[name] = (claim, make_variants)
+        return make_variants
+    return decorator
+
+
+@case('comprehension', 'i7: list comprehensions instead of map and filter')
+def _comprehension():
+    def map_filter(n):
+        return list(map(lambda x: x**2, filter(lambda x: x % 2 == 0,
+                                               range(n))))
+
+    def list_comp(n):
+        return [x**2 for x in range(n) if x % 2 == 0]
+
+    return {'map+filter': map_filter, 'list comprehension': list_comp}
+
+
+@case('generator', 'i9: generator expressions for large comprehensions')
+def _generator():
+    def list_comp(n):
+        return sum([x**2 for x in range(n)])
+
+    def gen_expr(n):
+        return sum(x**2 for x in range(n))
+
+    return {'list comprehension': list_comp, 'generator expression': gen_expr}
+
+
+@case('deque', 'i46: collections.deque for queues')
+def _deque():
+    def list_pop0(n):
+        queue = list(range(n))
+        while queue:
+            queue.pop(0)
+
+    def deque_popleft(n):
+        queue = deque(range(n))
+        while queue:
+            queue.popleft()
+
+    return {'list.pop(0)': list_pop0, 'deque.popleft()': deque_popleft}
+
+
+@case('bisect', 'i46: bisect instead of list.index on sorted data')
+def _bisect():
+    def index(n):
+        x = list(range(n))
+        return [x.index(i) for i in range(0, n, max(1, n // 100))]
+
+    def bisect(n):
+        x = list(range(n))
+        return [bisect_left(x, i) for i in range(0, n, max(1, n // 100))]
+
+    return {'list.index': index, 'bisect_left': bisect}
+
+
+@case('membership', "basket/set membership instead of scanning a list")
+def _membership():
+    def in_list(n):
+        items = list(range(n))
+        return sum(1 for i in range(0, 2 * n, max(1, n // 100)) if i in items)
+
+    def in_set(n):
+        items = set(range(n))
+        return sum(1 for i in range(0, 2 * n, max(1, n // 100)) if i in items)
+
+    return {'x in list': in_list, 'x in set': in_set}
+
+
+@case('enumerate', 'i10: enumerate instead of range(len())')
+def _enumerate():
+    def range_len(n):
+        items = list(range(n))
+        total = 0
+        for i in range(len(items)):
+            total += i * items[i]
+        return total
+
+    def enumerate_(n):
+        items = list(range(n))
+        total = 0
+        for i, item in enumerate(items):
+            total += i * item
+        return total
+
+    return {'range(len())': range_len, 'enumerate': enumerate_}
+
+
+@case('zip', 'i11: zip to process iterators in parallel')
+def _zip():
+    def indexes(n):
+        names = [str(i) for i in range(n)]
+        letters = [len(name) for name in names]
+        longest, best = None, 0
+        for i in range(len(names)):
+            if letters[i] > best:
+                longest, best = names[i], letters[i]
+        return longest
+
+    def zipped(n):
+        names = [str(i) for i in range(n)]
+        letters = [len(name) for name in names]
+        longest, best = None, 0
+        for name, count in zip(names, letters):
+            if count > best:
+                longest, best = name, count
+        return longest
+
+    return {'indexes': indexes, 'zip': zipped}
+
+
+@case('slice', 'i6: stride and slice in two steps vs one slice')
+def _slice():
+    def two_slices(n):
+        a = list(range(n))
+        b = a[::2]
+        return b[1:-1]
+
+    def one_slice(n):
+        a = list(range(n))
+        return a[2:-1:2] if n % 2 else a[2:-2:2]
+
+    return {'a[::2][1:-1]': two_slices, 'a[2:-1:2]': one_slice}
+
+
+def measure(func, n, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(n)
+        best = min(best, time.perf_counter() - start)
+    # tracemalloc slows allocation down, so memory gets its own run
+    tracemalloc.start()
+    func(n)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(names, sizes, repeat):
+    rows = []
+    for name in names:
+        claim, make_variants = CASES[name]
+        variants = make_variants()
+        for n in sizes:
+            if name == 'deque' and n > 200_000:
+                # list.pop(0) is quadratic; skip sizes that take minutes
+                continue
+            results = {variant: measure(func, n, repeat)
+                       for variant, func in variants.items()}
+            fastest = min(t for t, _ in results.values())
+            for variant, (seconds, peak) in results.items():
+                rows.append((name, n, variant, seconds, seconds / fastest,
+                             peak))
+    return rows
+
+
+def format_table(rows):
+    header = ('case', 'n', 'variant', 'time', 'vs best', 'peak mem')
+    lines = [f'{header[0]:14} {header[1]:>9} {header[2]:22} {header[3]:>11} '
+             f'{header[4]:>8} {header[5]:>11}']
+    lines.append('-' * len(lines[0]))
+    for name, n, variant, seconds, ratio, peak in rows:
+        lines.append(f'{name:14} {n:9d} {variant:22} '
+                     f'{seconds * 1e3:9.3f}ms {ratio:7.2f}x '
+                     f'{peak / 1024:8.1f}KiB')
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-s', '--sizes', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000])
+    parser.add_argument('-c', '--cases', nargs='+', choices=sorted(CASES),
+                        default=list(CASES))
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for name in args.cases:
+        print(f'{name:14} {CASES[name][0]}')
+    print()
+    print(format_table(run(args.cases, args.sizes, args.repeat)))
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Order-preserving bytes keys for tuple records (see the tuple comparisons
+in data_structures.py, `(1, 2, 3) < (1, 2, 4)`).
+
+encode_key() maps a record to bytes such that comparing the bytes gives
+the same order as comparing the tuples, so sorting, merging or bisecting
+keys is a plain memcmp instead of one Python comparison per element:
+
+• int: sign tag, magnitude length, then big-endian magnitude (complemented
+  for negatives). The length is one byte up to 254 bytes of magnitude and
+  an escape byte plus 8 bytes beyond, so any size of int works.
+• float: IEEE 754 bits with the sign bit flipped, or all bits flipped for
+  negatives. -0.0 is stored as 0.0, since the two compare equal, and every
+  NaN as the same positive NaN, which sorts after inf (Python gives NaN no
+  place in the order at all).
+• str (as UTF-8) and bytes: 0x00 escaped as 00 FF and terminated by 00 01,
+  so a prefix sorts before its extensions.
+• nested tuples: tag, elements, end marker; None sorts before anything.
+
+Each position of the records must hold a single type; ints and floats in
+the same position sort by type, not by value (Python would compare them).
+
+sort_records() does not call encode_key(): with NumPy it packs whole
+columns into fixed-width keys with the same int and float bit tricks and
+argsorts them in C; without NumPy it is plain sorted(), because encoding
+in pure Python costs more than it saves for one sort. encode_key() pays
+off when keys are stored and reused, e.g. as the records of
+examples/extsort.py or for bisecting with plain bytes.
+"""
+
+import math
+import random
+import struct
+import time
+from operator import itemgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+END, NONE, NEG_INT, POS_INT, FLOAT, STR, BYTES, TUPLE = (
+    b'\x01', b'\x02', b'\x10', b'\x11', b'\x20', b'\x30', b'\x40', b'\x50')
+
+_DOUBLE = struct.Struct('>d')
+_UINT64 = struct.Struct('>Q')
+_SIGN = 1 << 63
+_ALL = (1 << 64) - 1
+# length byte meaning "8-byte length follows"; 0 plays that role for
+# negative ints, whose length bytes are complemented
+_LONG = 255
+
+
+def _escape(data):
+    return data.replace(b'\x00', b'\x00\xff') + b'\x00\x01'
+
+
+def _encode_int(value):
+    if value >= 0:
+        size = (value.bit_length() + 7) // 8
+        length = bytes((size,)) if size < _LONG \
+            else bytes((_LONG,)) + _UINT64.pack(size)
+        return POS_INT + length + value.to_bytes(size, 'big')
+    magnitude = -value
+    size = (magnitude.bit_length() + 7) // 8
+    inverted = magnitude ^ ((1 << (8 * size)) - 1)
+    length = bytes((_LONG - size,)) if size < _LONG \
+        else b'\x00' + _UINT64.pack(_ALL - size)
+    return NEG_INT + length + inverted.to_bytes(size, 'big')
+
+
+def _float_bits(value):
+    (bits,) = _UINT64.unpack(_DOUBLE.pack(value))
+    return bits ^ _ALL if bits & _SIGN else bits | _SIGN
+
+
+def _encode_float(value):
+    if value == 0.0:
+        value = 0.0
+    elif value != value:
+        value = math.nan
+    return FLOAT + _UINT64.pack(_float_bits(value))
+
+
+def _encode_tuple(value):
+    return TUPLE + b''.join(map(encode_value, value)) + END
+
+
+_ENCODERS = {
+    type(None): lambda value: NONE,
+    bool: _encode_int,
+    int: _encode_int,
+    float: _encode_float,
+    str: lambda value: STR + _escape(value.encode('utf-8')),
+    bytes: lambda value: BYTES + _escape(value),
+    tuple: _encode_tuple,
+}
+
+
+def encode_value(value):
+    """
+    Tagged, self-delimiting bytes for one value; concatenations of them
+    can be split again with decode_value.
+    """
+    try:
+        return _ENCODERS[type(value)](value)
+    except KeyError:
+        raise TypeError(f'cannot encode {type(value).__name__} '
+                        'values') from None
+
+
+def encode_key(record):
+    """Order-preserving bytes for a tuple (or a single value)."""
+    if type(record) is tuple:
+        return b''.join(map(encode_value, record))
+    return encode_value(record)
+
+
+def _unescape(key, pos):
+    parts = []
+    while True:
+        stop = key.index(b'\x00', pos)
+        parts.append(key[pos:stop])
+        if key[stop + 1] == 0x01:
+            return b''.join(parts), stop + 2
+        parts.append(b'\x00')
+        pos = stop + 2
+
+
+def decode_value(key, pos=0):
+    """The value encoded at key[pos:] and the offset just past it."""
+    tag = key[pos:pos + 1]
+    pos += 1
+    if tag == NONE:
+        return None, pos
+    if tag == POS_INT:
+        size = key[pos]
+        pos += 1
+        if size == _LONG:
+            (size,) = _UINT64.unpack_from(key, pos)
+            pos += 8
+        return int.from_bytes(key[pos:pos + size], 'big'), pos + size
+    if tag == NEG_INT:
+        size = _LONG - key[pos]
+        pos += 1
+        if size == _LONG:
+            (size,) = _UINT64.unpack_from(key, pos)
+            size = _ALL - size
+            pos += 8
+        inverted = int.from_bytes(key[pos:pos + size], 'big')
+        return -(inverted ^ ((1 << (8 * size)) - 1)), pos + size
+    if tag == FLOAT:
+        (bits,) = _UINT64.unpack_from(key, pos)
+        bits = bits ^ _SIGN if bits & _SIGN else bits ^ _ALL
+        return _DOUBLE.unpack(_UINT64.pack(bits))[0], pos + 8
+    if tag == STR:
+        data, pos = _unescape(key, pos)
+        return data.decode('utf-8'), pos
+    if tag == BYTES:
+        return _unescape(key, pos)
+    if tag == TUPLE:
+        items = []
+        while key[pos:pos + 1] != END:
+            item, pos = decode_value(key, pos)
+            items.append(item)
+        return tuple(items), pos + 1
+    raise ValueError(f'bad tag {tag!r} at offset {pos - 1}')
+
+
+def decode_key(key):
+    """Inverse of encode_key for tuple records."""
+    items = []
+    pos = 0
+    while pos < len(key):
+        item, pos = decode_value(key, pos)
+        items.append(item)
+    return tuple(items)
+
+
+def _numpy_keys(records):
+    """
+    Fixed-width big-endian key per record, or None when a column is not
+    all int64, all float or all str/bytes without NUL characters.
+    """
+    if not records or type(records[0]) is not tuple:
+        return None
+    width = len(records[0])
+    if any(len(record) != width for record in records):
+        return None
+    fields, columns = [], []
+    for i in range(width):
+        column = list(map(itemgetter(i), records))
+        kinds = set(map(type, column))
+        if kinds <= {int, bool}:
+            try:
+                values = numpy.array(column, dtype=numpy.int64)
+            except OverflowError:
+                return None
+            values = values.view(numpy.uint64) ^ numpy.uint64(_SIGN)
+            fields.append((f'f{i}', '>u8'))
+        elif kinds == {float}:
+            # + 0.0 turns -0.0 into 0.0; NaNs become one NaN, as in
+            # _encode_float
+            floats = numpy.array(column, dtype=numpy.float64) + 0.0
+            floats[numpy.isnan(floats)] = numpy.nan
+            bits = floats.view(numpy.uint64)
+            values = bits ^ numpy.where(bits >> numpy.uint64(63),
+                                        numpy.uint64(_ALL),
+                                        numpy.uint64(_SIGN))
+            fields.append((f'f{i}', '>u8'))
+        elif kinds == {str} or kinds == {bytes}:
+            if kinds == {str}:
+                column = [value.encode('utf-8') for value in column]
+            if b'\x00' in b''.join(column):
+                # values are NUL-padded to a fixed width, so one ending in
+                # NUL would tie with its prefix
+                return None
+            values = numpy.array(column, dtype=bytes)
+            fields.append((f'f{i}', values.dtype))
+        else:
+            return None
+        columns.append(values)
+    packed = numpy.empty(len(records), dtype=fields)
+    for (name, _), values in zip(fields, columns):
+        packed[name] = values
+    return packed.view(f'S{packed.dtype.itemsize}')
+
+
+def sort_records(records, reverse=False):
+    """
+    sorted(records, reverse=reverse) for a list of tuples, comparing
+    fixed-width keys in NumPy instead of tuples when the columns allow it.
+    Equal records keep their order.
+    """
+    records = list(records)
+    keys = _numpy_keys(records) if numpy is not None else None
+    if keys is not None:
+        if reverse:
+            # stable descending: sort the reversed keys, map indexes back
+            order = numpy.argsort(keys[::-1], kind='stable')[::-1]
+            order = len(records) - 1 - order
+        else:
+            order = numpy.argsort(keys, kind='stable')
+        return list(map(records.__getitem__, order.tolist()))
+    # encoding in pure Python costs more than the comparisons it saves
+    return sorted(records, reverse=reverse)
+
+
+if __name__ == "__main__":
+    n = 1_000_000
+    rng = random.Random(0)
+    records = [(rng.randrange(1000), rng.random(), f'name{rng.randrange(n)}')
+               for _ in range(n)]
+
+    start_time = time.time()
+    expected = sorted(records)
+    print(f"sorted() on tuples     {time.time() - start_time:.3f}s")
+
+    start_time = time.time()
+    keys = list(map(encode_key, records))
+    encoded = time.time() - start_time
+    start_time = time.time()
+    keys.sort()
+    print(f"encode_key             {encoded:.3f}s, sorting the bytes keys "
+          f"{time.time() - start_time:.3f}s")
+    assert list(map(decode_key, keys)) == expected
+
+    start_time = time.time()
+    result = sort_records(records)
+    print(f"sort_records           {time.time() - start_time:.3f}s "
+          f"(numpy={'yes' if numpy else 'no'})")
+    assert result == expected
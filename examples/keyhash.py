@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Stable bytes for hashing keys, shared by counters.py and filters.py.
+
+hash() is salted per process (PYTHONHASHSEED) and repr() is neither stable
+across versions nor faithful to equality: repr(1) != repr(1.0) although
+1 == 1.0. key_bytes() gives the same bytes for equal keys in every
+process, so sketches and filters built apart can be merged:
+
+• str: UTF-8; bytes, bytearray, memoryview: the bytes themselves.
+• int and bool: signed little-endian two's complement.
+• float: an integral float as the equal int, otherwise its IEEE 754 bits.
+• tuple: each element's bytes with a length prefix.
+
+Each kind has its own tag byte, so 'a' and b'a' do not collide. Any other
+type raises TypeError rather than falling back to repr().
+"""
+
+import struct
+
+_DOUBLE = struct.Struct('<d')
+_LENGTH = struct.Struct('<Q')
+
+
+def _int_bytes(value):
+    return b'i' + value.to_bytes(value.bit_length() // 8 + 1, 'little',
+                                 signed=True)
+
+
+def key_bytes(key):
+    """The bytes hashed for `key`; equal keys give equal bytes."""
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8')
+    if isinstance(key, (bytes, bytearray, memoryview)):
+        return b'b' + bytes(key)
+    if isinstance(key, int):
+        return _int_bytes(key)
+    if isinstance(key, float):
+        if key.is_integer():
+            return _int_bytes(int(key))
+        return b'f' + _DOUBLE.pack(key)
+    if isinstance(key, tuple):
+        parts = [b't']
+        for item in key:
+            item = key_bytes(item)
+            parts.append(_LENGTH.pack(len(item)))
+            parts.append(item)
+        return b''.join(parts)
+    raise TypeError(f'cannot hash {type(key).__name__} keys stably')
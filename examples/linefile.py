@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Random access to the lines of a text file without reading it into memory,
+for the `f.read()` / `len(f.readlines())` patterns of string.py and
+errors_exeptions.py.
+
+readlines() builds one str per line, several times the file size in
+memory, before line 1_000_000 can be looked at. MMapTextFile maps the file
+with mmap and keeps only the byte offset where each line starts, an
+array('Q') of 8 bytes per line. lines[i] slices the mapping between two
+offsets and decodes that one line, so after indexing a lookup costs a few
+microseconds whatever the file size, and only the touched pages are read.
+
+• The index is built by chunks: bytes.splitlines over a chunk (split
+  when it holds a '\\r') plus itertools.accumulate of the line lengths
+  gives the offsets in C, or numpy.flatnonzero(chunk == b'\\n') when
+  NumPy is installed. Files larger than workers * _PARALLEL_MIN are split
+  into byte ranges indexed by a multiprocessing.Pool, one range per
+  worker, and the results joined.
+• index_path=True persists the index next to the file (path + '.lineidx')
+  together with the file's size and st_mtime_ns; the next open maps it
+  back in microseconds if both still match, and rebuilds it otherwise.
+• Lines end at b'\\n' and keep their ending untranslated, '\\r\\n'
+  included, as open(path, newline='\\n').readlines() would return them;
+  plain readlines() turns '\\r\\n' into '\\n'. Decoding happens only for
+  the lines accessed: file[i], file[a:b], iteration.
+• The encoding must write '\\n' as the single byte 0x0A (UTF-8, Latin-1,
+  cp1252, Shift-JIS ...); UTF-16/32 and EBCDIC are rejected, since their
+  line ends cannot be found by looking for that byte.
+"""
+
+import codecs
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate, islice
+from multiprocessing import Pool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_HEADER = struct.Struct('=8sQQQ')
+_MAGIC = b'LINEIDX1'
+_CHUNK = 16 << 20
+_PARALLEL_MIN = 64 << 20
+
+
+def _line_ends(path, start, stop, chunk_size=_CHUNK):
+    """Offsets just past each newline in bytes [start, stop) of path."""
+    ends = array('Q')
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for low in range(start, stop, chunk_size):
+            data = mm[low:min(low + chunk_size, stop)]
+            if numpy is not None:
+                found = numpy.flatnonzero(
+                    numpy.frombuffer(data, numpy.uint8) == 10)
+                ends.frombytes((found + (low + 1)).astype(numpy.uint64)
+                               .tobytes())
+                continue
+            if b'\r' not in data:
+                # splitlines keeps the newline and is faster than split,
+                # but also splits at '\r'
+                pieces = data.splitlines(True)
+                if not data.endswith(b'\n'):
+                    # the piece after the last newline is not a line
+                    pieces.pop()
+                lengths = map(len, pieces)
+            else:
+                pieces = data.split(b'\n')[:-1]
+                lengths = map((1).__add__, map(len, pieces))
+            ends.extend(islice(accumulate(lengths, initial=low), 1, None))
+    return ends
+
+
+def build_index(path, workers=None, chunk_size=_CHUNK):
+    """array('Q') of line start offsets, plus the file size at the end."""
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, size // _PARALLEL_MIN))
+    index = array('Q', [0])
+    if not size:
+        return index
+    if workers == 1:
+        index += _line_ends(path, 0, size, chunk_size)
+    else:
+        step = -(-size // workers)
+        ranges = [(path, low, min(low + step, size), chunk_size)
+                  for low in range(0, size, step)]
+        with Pool(workers) as pool:
+            for ends in pool.starmap(_line_ends, ranges):
+                index += ends
+    # a last line without newline ends at the end of the file; a trailing
+    # newline already put `size` there
+    if index[-1] != size:
+        index.append(size)
+    return index
+
+
+class MMapTextFile(Sequence):
+    """
+    The lines of a text file as a read-only sequence of str.
+    Args:
+        path: the file.
+        encoding, errors: as for open(); the encoding must be
+            ASCII-compatible.
+        index_path: where to persist the line index; True for
+            path + '.lineidx', None to keep it in memory only.
+        workers: processes for building the index, default os.cpu_count().
+    """
+
+    def __init__(self, path, encoding='utf-8', errors='strict',
+                 index_path=None, workers=None):
+        if codecs.encode('\n', encoding) != b'\n':
+            raise ValueError(f'{encoding} does not encode newline as '
+                             f'0x0A; MMapTextFile needs an ASCII-compatible '
+                             f'encoding')
+        self.path = path
+        self.encoding = encoding
+        self.errors = errors
+        self.index_path = path + '.lineidx' if index_path is True \
+            else index_path
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        # mmap cannot map an empty file
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ) if stat.st_size \
+            else b''
+        self._index_file = self._index_mmap = None
+        self._offsets = self._load_index(stat)
+        if self._offsets is None:
+            self._offsets = build_index(path, workers)
+            if self.index_path is not None:
+                self._save_index(stat)
+
+    def _load_index(self, stat):
+        if self.index_path is None or not os.path.exists(self.index_path):
+            return None
+        index_file = open(self.index_path, 'rb')
+        index_size = os.fstat(index_file.fileno()).st_size
+        if index_size < _HEADER.size:
+            index_file.close()
+            return None
+        index_mmap = mmap.mmap(index_file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        magic, size, mtime_ns, count = _HEADER.unpack_from(index_mmap)
+        if (magic != _MAGIC or size != stat.st_size
+                or mtime_ns != stat.st_mtime_ns
+                or index_size != _HEADER.size + 8 * count):
+            # stale: the file changed since the index was written
+            index_mmap.close()
+            index_file.close()
+            return None
+        self._index_file = index_file
+        self._index_mmap = index_mmap
+        return memoryview(index_mmap)[_HEADER.size:].cast('Q')
+
+    def _save_index(self, stat):
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, stat.st_size, stat.st_mtime_ns,
+                                 len(self._offsets)))
+            self._offsets.tofile(f)
+        os.replace(temporary, self.index_path)
+
+    def close(self):
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+            self._index_mmap.close()
+            self._index_file.close()
+        if self._mmap:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def line_bytes(self, i):
+        """The raw bytes of line i, newline included."""
+        if i < 0:
+            i += len(self._offsets) - 1
+        if not 0 <= i < len(self._offsets) - 1:
+            raise IndexError('line index out of range')
+        return self._mmap[self._offsets[i]:self._offsets[i + 1]]
+
+    def offset(self, i):
+        """Byte offset where line i starts."""
+        return self._offsets[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            offsets = self._offsets
+            mm = self._mmap
+            return [str(mm[offsets[j]:offsets[j + 1]], self.encoding,
+                        self.errors)
+                    for j in range(*i.indices(len(offsets) - 1))]
+        return str(self.line_bytes(i), self.encoding, self.errors)
+
+    def __iter__(self):
+        offsets = self._offsets
+        mm = self._mmap
+        for j in range(len(offsets) - 1):
+            yield str(mm[offsets[j]:offsets[j + 1]], self.encoding,
+                      self.errors)
+
+
+if __name__ == "__main__":
+    n = 3_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            for low in range(0, n, 100_000):
+                f.write(''.join(f'{i:08d} GET /item/{i % 9973} 200 '
+                                f'{"é" * (i % 5)}\n'
+                                for i in range(low, low + 100_000)))
+        size_mib = os.path.getsize(path) >> 20
+
+        start_time = time.time()
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        expected = lines[1_000_000]
+        print(f"{n} lines ({size_mib} MiB): readlines() "
+              f"{time.time() - start_time:.2f}s")
+        del lines
+
+        start_time = time.time()
+        with MMapTextFile(path, index_path=True, workers=1) as lines:
+            print(f"build index: {time.time() - start_time:.2f}s "
+                  f"({'numpy' if numpy is not None else 'split'}), "
+                  f"{len(lines._offsets) * 8 >> 20} MiB of offsets")
+            assert lines[1_000_000] == expected
+
+        start_time = time.time()
+        with MMapTextFile(path, index_path=True) as lines:
+            opened = time.time() - start_time
+            start_time = time.time()
+            for _ in range(100_000):
+                line = lines[1_000_000]
+            lookup = (time.time() - start_time) / 100_000
+            assert line == expected and len(lines) == n
+            print(f"reopen with persisted index: {opened * 1e3:.3f}ms, "
+                  f"lines[1_000_000] {lookup * 1e6:.2f}us: {line!r}")
+            print(f"lines[-2:] = {lines[-2:]}")
+
+        start_time = time.time()
+        parallel = build_index(path, workers=4)
+        print(f"build_index(workers=4): {time.time() - start_time:.2f}s")
+        with MMapTextFile(path) as lines:
+            assert parallel == lines._offsets
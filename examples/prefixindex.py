@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+A read-only sorted string -> int mapping with prefix queries, for
+directories like `tel = {'jack': 4098, 'sape': 4139}` with tens of millions
+of names.
+
+A dict of str costs roughly 50 bytes per str object plus about 30 bytes of
+hash table and 32 bytes per int, and answering "names starting with 'ja'"
+means scanning every key. PrefixIndex keeps:
+
+• all keys UTF-8 encoded back to back in one bytes blob,
+• an array('Q') of offsets into the blob,
+• an array('q') of values,
+
+so an entry costs its key length plus 16 bytes. UTF-8 bytes sort like the
+str code points, so bisecting the blob gives exact lookup in O(log n) and a
+prefix maps to one contiguous run of entries: count_prefix() is two
+bisects and items(prefix) walks only the matches, in sorted order. Every
+64th key is also kept as a bytes object, so most of each bisect runs in C.
+"""
+
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+_BLOCK = 64
+
+
+class _Keys:
+    """The encoded keys as a sequence, for bisect."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+
+class PrefixIndex(Mapping):
+    """
+    Build with from_sorted() from a stream of (key, value) pairs in key
+    order, or from_mapping() for anything else. Values are ints stored in
+    an array of `typecode`.
+    """
+
+    def __init__(self, blob=b'', offsets=None, values=None):
+        self.blob = blob
+        self.offsets = offsets if offsets is not None else array('Q', [0])
+        self.values = values if values is not None else array('q')
+        self._keys = _Keys(self.blob, self.offsets)
+        self._sample = [self._keys[i] for i in range(0, len(self), _BLOCK)]
+
+    @classmethod
+    def from_sorted(cls, pairs, typecode='q'):
+        """Bulk build in one pass; keys must be unique and ascending."""
+        blob = bytearray()
+        offsets = array('Q', [0])
+        values = array(typecode)
+        last = None
+        for key, value in pairs:
+            encoded = key.encode('utf-8')
+            if last is not None and encoded <= last:
+                raise ValueError(f'keys must be unique and sorted: {key!r} '
+                                 'after ' + repr(last.decode('utf-8')))
+            blob += encoded
+            offsets.append(len(blob))
+            values.append(value)
+            last = encoded
+        return cls(bytes(blob), offsets, values)
+
+    @classmethod
+    def from_mapping(cls, mapping, typecode='q'):
+        return cls.from_sorted(sorted(mapping.items()), typecode)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _lower(self, encoded):
+        """Position of the first key >= encoded."""
+        block = bisect_left(self._sample, encoded)
+        # sample[block - 1] < encoded <= sample[block]
+        return bisect_left(self._keys, encoded, max(0, (block - 1) * _BLOCK),
+                           min(block * _BLOCK, len(self)))
+
+    def _find(self, encoded):
+        i = self._lower(encoded)
+        if i < len(self.values) and self._keys[i] == encoded:
+            return i
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key.encode('utf-8')) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return self.values[i]
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key.encode('utf-8')) >= 0
+
+    def _span(self, prefix):
+        encoded = prefix.encode('utf-8')
+        # 0xff never occurs in UTF-8, so it sorts after every extension
+        return self._lower(encoded), self._lower(encoded + b'\xff')
+
+    def _keys_between(self, start, stop):
+        blob, offsets = self.blob, self.offsets
+        for i in range(start, stop):
+            yield blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+
+    def __iter__(self):
+        return self._keys_between(0, len(self.values))
+
+    def count_prefix(self, prefix):
+        start, stop = self._span(prefix)
+        return stop - start
+
+    def keys(self, prefix=''):
+        """Keys starting with `prefix`, in sorted order."""
+        if not prefix:
+            return super().keys()
+        return self._keys_between(*self._span(prefix))
+
+    def items(self, prefix=''):
+        if not prefix:
+            return super().items()
+        start, stop = self._span(prefix)
+        return zip(self._keys_between(start, stop),
+                   self.values[start:stop])
+
+    def complete(self, prefix, limit=10):
+        """The first `limit` keys for autocompletion."""
+        start, stop = self._span(prefix)
+        return list(self._keys_between(start, min(stop, start + limit)))
+
+    def nbytes(self):
+        return (len(self.blob) + self.offsets.itemsize * len(self.offsets)
+                + self.values.itemsize * len(self.values)
+                + sum(map(sys.getsizeof, self._sample)) + 8 * len(self._sample))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(array('Q', [len(self.values), len(self.blob)]).tobytes())
+            f.write(self.values.typecode.encode('ascii'))
+            self.offsets.tofile(f)
+            self.values.tofile(f)
+            f.write(self.blob)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            count, size = array('Q', f.read(16))
+            typecode = f.read(1).decode('ascii')
+            offsets, values = array('Q'), array(typecode)
+            offsets.fromfile(f, count + 1)
+            values.fromfile(f, count)
+            return cls(f.read(size), offsets, values)
+
+
+def make_names(n, seed=0):
+    rng = random.Random(seed)
+    syllables = ['ja', 'ck', 'sa', 'pe', 'gu', 'id', 'o', 'an', 'na', 'li',
+                 'ma', 'ri', 'te', 'ko', 'su', 'el']
+    names = set()
+    while len(names) < n:
+        names.add(''.join(rng.choices(syllables, k=rng.randint(2, 6)))
+                  + str(rng.randrange(1000)))
+    return {name: 4000 + i for i, name in enumerate(names)}
+
+
+if __name__ == "__main__":
+    n = 1_000_000
+    tel = make_names(n)
+    dict_bytes = sys.getsizeof(tel) + sum(
+        sys.getsizeof(name) + sys.getsizeof(number)
+        for name, number in tel.items())
+    index = PrefixIndex.from_mapping(tel)
+    print(f"{n} names: dict of str {dict_bytes / n:.0f} B/entry, "
+          f"PrefixIndex {index.nbytes() / n:.0f} B/entry")
+
+    prefix = 'jasu'
+    start_time = time.time()
+    expected = sorted(name for name in tel if name.startswith(prefix))
+    scan = time.time() - start_time
+    start_time = time.time()
+    found = list(index.keys(prefix))
+    print(f"names starting with {prefix!r}: {len(found)}, dict scan "
+          f"{scan:.3f}s, PrefixIndex {time.time() - start_time:.6f}s")
+    assert found == expected
+    assert index.count_prefix(prefix) == len(expected)
+    print(f"complete('jaja'): {index.complete('jaja', 5)}")
+
+    names = random.Random(1).sample(sorted(tel), 100_000)
+    start_time = time.time()
+    for name in names:
+        tel[name]
+    lookups = time.time() - start_time
+    start_time = time.time()
+    for name in names:
+        index[name]
+    print(f"100000 lookups: dict {lookups:.3f}s, "
+          f"PrefixIndex {time.time() - start_time:.3f}s")
+    assert all(index[name] == tel[name] for name in names)
+    assert list(index) == sorted(tel)
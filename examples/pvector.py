@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Persistent vector for cheap `b = a[:]` snapshots (E.P.1 i5).
+
+A list snapshot copies all n references. PVector is the 32-way trie used by
+Clojure and pyrsistent: it is never modified in place, an update copies only
+the O(log32 n) nodes on the path to the changed slot and shares the rest, so
+a snapshot is just another reference to the current version.
+
+Layout: `root` is a tree of nodes holding up to 32 children each, `shift`
+is 5 * (tree height), and the last 1..32 items live in `tail` so appends
+rarely touch the tree at all.
+"""
+
+import random
+import time
+import tracemalloc
+from collections.abc import Sequence
+from itertools import islice
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+def _new_path(level, node):
+    while level:
+        node = [node]
+        level -= BITS
+    return node
+
+
+class PVector(Sequence):
+    __slots__ = ('_count', '_shift', '_root', '_tail')
+
+    def __init__(self, iterable=()):
+        items = list(iterable)
+        count = len(items)
+        tail_offset = ((count - 1) >> BITS) << BITS if count else 0
+        nodes = [items[i:i + WIDTH] for i in range(0, tail_offset, WIDTH)]
+        shift = BITS
+        while len(nodes) > WIDTH:
+            nodes = [nodes[i:i + WIDTH] for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+        self._count = count
+        self._shift = shift
+        self._root = nodes
+        self._tail = items[tail_offset:]
+
+    @classmethod
+    def _make(cls, count, shift, root, tail):
+        vector = cls.__new__(cls)
+        vector._count = count
+        vector._shift = shift
+        vector._root = root
+        vector._tail = tail
+        return vector
+
+    def _tail_offset(self):
+        count = self._count
+        return ((count - 1) >> BITS) << BITS if count else 0
+
+    def _leaf_for(self, index):
+        if index >= self._tail_offset():
+            return self._tail
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node[(index >> level) & MASK]
+            level -= BITS
+        return node
+
+    def _check(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('PVector index out of range')
+        return index
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PVector(self[i] for i in range(self._count)[index])
+        index = self._check(index)
+        return self._leaf_for(index)[index & MASK]
+
+    def __iter__(self):
+        for start in range(0, self._tail_offset(), WIDTH):
+            yield from self._leaf_for(start)
+        yield from self._tail
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            x == y for x, y in zip(self, other))
+
+    def __repr__(self):
+        if self._count <= 10:
+            return f'PVector({list(self)!r})'
+        head = ', '.join(map(repr, islice(self, 10)))
+        return f'PVector([{head}, ...])'
+
+    def append(self, item):
+        """Return a new vector with `item` added at the end."""
+        count, shift, root, tail = (self._count, self._shift, self._root,
+                                    self._tail)
+        if count - self._tail_offset() < WIDTH or not count:
+            return self._make(count + 1, shift, root, tail + [item])
+        # the tail is full: push it into the tree and start a new one
+        if (count >> BITS) > (1 << shift):
+            root = [root, _new_path(shift, tail)]
+            shift += BITS
+        else:
+            root = self._push_tail(shift, root, tail)
+        return self._make(count + 1, shift, root, [item])
+
+    def _push_tail(self, level, parent, tail):
+        index = ((self._count - 1) >> level) & MASK
+        node = list(parent)
+        if level == BITS:
+            child = tail
+        elif index < len(parent):
+            child = self._push_tail(level - BITS, parent[index], tail)
+        else:
+            child = _new_path(level - BITS, tail)
+        if index == len(node):
+            node.append(child)
+        else:
+            node[index] = child
+        return node
+
+    def set(self, index, item):
+        """Return a new vector with position `index` replaced by `item`."""
+        index = self._check(index)
+        if index >= self._tail_offset():
+            tail = list(self._tail)
+            tail[index & MASK] = item
+            return self._make(self._count, self._shift, self._root, tail)
+        return self._make(self._count, self._shift,
+                          self._assoc(self._shift, self._root, index, item),
+                          self._tail)
+
+    def _assoc(self, level, node, index, item):
+        node = list(node)
+        if level == 0:
+            node[index & MASK] = item
+        else:
+            slot = (index >> level) & MASK
+            node[slot] = self._assoc(level - BITS, node[slot], index, item)
+        return node
+
+    def pop(self):
+        """Return a new vector without the last item."""
+        count = self._count
+        if not count:
+            raise IndexError('pop from empty PVector')
+        if count == 1:
+            return PVector()
+        if count - self._tail_offset() > 1:
+            return self._make(count - 1, self._shift, self._root,
+                              self._tail[:-1])
+        tail = self._leaf_for(count - 2)
+        shift = self._shift
+        root = self._pop_tail(shift, self._root)
+        if root is None:
+            root = []
+        if shift > BITS and len(root) == 1:
+            root = root[0]
+            shift -= BITS
+        return self._make(count - 1, shift, root, tail)
+
+    def _pop_tail(self, level, node):
+        index = ((self._count - 2) >> level) & MASK
+        if level > BITS:
+            child = self._pop_tail(level - BITS, node[index])
+            if child is None and index == 0:
+                return None
+            if child is None:
+                return node[:index]
+            node = list(node)
+            node[index] = child
+            return node
+        if index == 0:
+            return None
+        return node[:index]
+
+    def extend(self, iterable):
+        vector = self
+        for item in iterable:
+            vector = vector.append(item)
+        return vector
+
+
+class CowList:
+    """
+    List-like holder for one writer: mutations replace the underlying
+    PVector, so snapshot() is O(1) and snapshots never see later writes.
+    """
+
+    def __init__(self, iterable=()):
+        self._vector = PVector(iterable)
+
+    def snapshot(self):
+        return self._vector
+
+    def __len__(self):
+        return len(self._vector)
+
+    def __getitem__(self, index):
+        return self._vector[index]
+
+    def __iter__(self):
+        return iter(self._vector)
+
+    def __setitem__(self, index, item):
+        if isinstance(index, slice):
+            if index != slice(None):
+                items = list(self._vector)
+                items[index] = item
+                item = items
+            # `a[:] = [...]` replaces the contents in place
+            self._vector = PVector(item)
+        else:
+            self._vector = self._vector.set(index, item)
+
+    def append(self, item):
+        self._vector = self._vector.append(item)
+
+    def extend(self, iterable):
+        self._vector = self._vector.extend(iterable)
+
+    def pop(self):
+        item = self._vector[-1]
+        self._vector = self._vector.pop()
+        return item
+
+    def __repr__(self):
+        return f'CowList({list(self._vector)!r})'
+
+
+def snapshot_workload(make, snapshot, n, rounds, writes):
+    rng = random.Random(0)
+    a = make(range(n))
+    snapshots = []
+    start_time = time.time()
+    for _ in range(rounds):
+        for _ in range(writes):
+            a[rng.randrange(n)] = -1
+        snapshots.append(snapshot(a))
+    return snapshots, time.time() - start_time
+
+
+if __name__ == "__main__":
+    n, rounds, writes = 1_000_000, 100, 10
+    for name, make, snapshot in [
+            ('list a[:]', list, lambda a: a[:]),
+            ('CowList', CowList, CowList.snapshot)]:
+        _, duration = snapshot_workload(make, snapshot, n, rounds, writes)
+        tracemalloc.start()
+        snapshots, _ = snapshot_workload(make, snapshot, n, rounds, writes)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:10} {rounds} x ({writes} writes + snapshot) of {n} "
+              f"items: {duration:.3f}s, peak {peak / 2**20:.1f} MiB")
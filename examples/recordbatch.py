@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Struct-of-arrays record batches for the parallel `names` / `letters` lists
+of data_structures.py (E.P.1 i11).
+
+    longest_name = None
+    max_letters = 0
+    for name, count in zip(names, letters):
+        ...
+
+runs one Python iteration per row. RecordBatch keeps each column in one
+container, array('q') / array('d') for numbers, a list or a dictionary
+encoded examples/categorical.py Categorical for strings, so queries become
+whole-column calls that loop in C:
+
+• argmax(column, key=None) is max() then index(), two C passes;
+• filter(), take() and sort_by() compute row numbers once and gather
+  every column with map(column.__getitem__, rows);
+• batch[i] is a Row view that reads the columns on access, no copy;
+• batch.rows('name', 'letters') yields tuples for the chosen columns.
+"""
+
+import random
+import time
+from array import array
+from itertools import compress
+
+from categorical import Categorical
+
+
+def _gather(column, rows):
+    if isinstance(column, Categorical):
+        return column.take(rows)
+    values = map(column.__getitem__, rows)
+    if isinstance(column, array):
+        return array(column.typecode, values)
+    return list(values)
+
+
+def _sort_keys(column):
+    """A sequence that orders like the column, cheap to compare."""
+    if isinstance(column, Categorical):
+        # rank the few categories once, then compare small ints per row
+        ranks = [0] * len(column.categories)
+        for rank, code in enumerate(sorted(
+                range(len(column.categories)),
+                key=column.categories.__getitem__)):
+            ranks[code] = rank
+        return list(map(ranks.__getitem__, column.codes))
+    return column
+
+
+class Row:
+    """
+    View of one row; reads through to the batch's columns. row.name works
+    for any column except those named keys or as_dict, which are methods;
+    row['keys'] reads every column.
+    """
+
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, name):
+        return self._batch.columns[name][self._index]
+
+    def __getattr__(self, name):
+        try:
+            return self._batch.columns[name][self._index]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def keys(self):
+        return self._batch.columns.keys()
+
+    def as_dict(self):
+        return {name: column[self._index]
+                for name, column in self._batch.columns.items()}
+
+    def __repr__(self):
+        return f'Row({self._index}, {self.as_dict()})'
+
+
+class RecordBatch:
+    """
+    Named columns of equal length.
+    Args:
+        columns: {name: array, list or Categorical}.
+    """
+
+    def __init__(self, columns):
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'columns have different lengths: {lengths}')
+        self.columns = dict(columns)
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_columns(cls, categorical=(), **columns):
+        """
+        Build from iterables: ints go to array('q'), floats to array('d'),
+        strings to a list, or a Categorical for the names in `categorical`.
+        """
+        built = {}
+        for name, values in columns.items():
+            if name in categorical:
+                built[name] = Categorical(values)
+                continue
+            values = list(values)
+            kinds = set(map(type, values))
+            if kinds == {int}:
+                built[name] = array('q', values)
+            elif kinds and kinds <= {int, float}:
+                built[name] = array('d', values)
+            else:
+                built[name] = values
+        return cls(built)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            return self.columns[index]
+        if isinstance(index, slice):
+            return RecordBatch({name: column[index]
+                                for name, column in self.columns.items()})
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('row index out of range')
+        return Row(self, index)
+
+    def __iter__(self):
+        return map(Row, [self] * self._length, range(self._length))
+
+    def __repr__(self):
+        kinds = ', '.join(f'{name}: {type(column).__name__}'
+                          for name, column in self.columns.items())
+        return f'RecordBatch({self._length} rows; {kinds})'
+
+    def rows(self, *names):
+        """Tuples of the named columns (all by default), row by row."""
+        names = names or tuple(self.columns)
+        return zip(*(self.columns[name] for name in names))
+
+    def _arg(self, name, key, best):
+        column = self.columns[name]
+        if not self._length:
+            raise ValueError(f'{best.__name__} of an empty batch')
+        if isinstance(column, Categorical):
+            # evaluate per category, not per row
+            categories = column.categories
+            if key is None:
+                value = best(map(categories.__getitem__, set(column.codes)))
+                return column.codes.index(column.index[value])
+            keys = list(map(key, categories))
+            column = list(map(keys.__getitem__, column.codes))
+        elif key is not None:
+            column = list(map(key, column))
+        return column.index(best(column))
+
+    def argmax(self, name, key=None):
+        """First row with the largest value, or largest key(value)."""
+        return self._arg(name, key, max)
+
+    def argmin(self, name, key=None):
+        return self._arg(name, key, min)
+
+    def take(self, rows):
+        """New batch with the given rows, in that order."""
+        rows = rows if isinstance(rows, (list, array, range)) else list(rows)
+        return RecordBatch({name: _gather(column, rows)
+                            for name, column in self.columns.items()})
+
+    def filter(self, name, predicate):
+        """Rows where predicate(value of column `name`) is true."""
+        column = self.columns[name]
+        if isinstance(column, Categorical):
+            # evaluate the predicate once per category
+            keep = list(map(predicate, column.categories))
+            mask = map(keep.__getitem__, column.codes)
+        else:
+            mask = map(predicate, column)
+        return self.take(array('q', compress(range(self._length), mask)))
+
+    def sort_by(self, name, reverse=False):
+        keys = _sort_keys(self.columns[name])
+        order = sorted(range(self._length), key=keys.__getitem__,
+                       reverse=reverse)
+        return self.take(order)
+
+
+def make_names(n, seed=0):
+    rng = random.Random(seed)
+    first = ['Cecilia', 'Lise', 'Marie', 'Ada', 'Emmy', 'Grace', 'Sofia',
+             'Hypatia', 'Rosalind', 'Dorothy', 'Katherine', 'Chien-Shiung']
+    return [f'{rng.choice(first)} {rng.randrange(10**rng.randint(1, 6))}'
+            for _ in range(n)]
+
+
+if __name__ == "__main__":
+    n = 1_000_000
+    names = make_names(n)
+    letters = [len(name) for name in names]
+
+    start_time = time.time()
+    longest_name = None
+    max_letters = 0
+    for name, count in zip(names, letters):
+        if count > max_letters:
+            longest_name = name
+            max_letters = count
+    print(f"zip loop:        {time.time() - start_time:.3f}s  {longest_name}")
+
+    batch = RecordBatch.from_columns(name=names, letters=letters)
+    start_time = time.time()
+    row = batch[batch.argmax('letters')]
+    print(f"argmax(letters): {time.time() - start_time:.3f}s  {row.name}")
+    start_time = time.time()
+    row = batch[batch.argmax('name', key=len)]
+    print(f"argmax(name, key=len): {time.time() - start_time:.3f}s  "
+          f"{row.name}")
+    assert row.name == longest_name
+
+    start_time = time.time()
+    short = [(name, count) for name, count in zip(names, letters)
+             if count < 8]
+    short.sort(key=lambda pair: pair[1])
+    print(f"lists: filter + sort {time.time() - start_time:.3f}s")
+    start_time = time.time()
+    result = batch.filter('letters', (8).__gt__).sort_by('letters')
+    print(f"batch: filter + sort {time.time() - start_time:.3f}s")
+    assert list(result.rows()) == short
+
+    first = RecordBatch.from_columns(categorical=('first',),
+                                     first=(name.split()[0] for name in names),
+                                     letters=letters)
+    start_time = time.time()
+    grace = first.filter('first', 'Grace'.__eq__)
+    print(f"Categorical filter: {time.time() - start_time:.3f}s, "
+          f"{len(grace)} rows, first {grace[0]}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Zero-copy slicing for large sequences (E.P.1 i5, i6).
+
+`a[:20]`, `a[-20:]` and `a[::2]` each copy. SeqView keeps a reference to
+the base sequence plus a range of indexes; slicing a view slices the range,
+which Python does in O(1) however the start, stop and stride combine.
+"""
+
+import time
+import tracemalloc
+from collections.abc import Sequence
+from itertools import islice
+
+
+class SeqView(Sequence):
+    """
+    Read-only window onto `base` selecting the indexes in `indexes`.
+    Writes to the base show through the view; copy with materialize().
+    """
+
+    __slots__ = ('base', 'indexes')
+
+    def __init__(self, base, indexes=None):
+        if isinstance(base, SeqView):
+            # a view of a view composes the index ranges, never nests
+            base, outer = base.base, base.indexes
+        else:
+            outer = range(len(base))
+        if indexes is None:
+            indexes = outer
+        elif isinstance(indexes, slice):
+            indexes = outer[indexes]
+        elif indexes:
+            # a range of positions in `outer`, mapped to positions in base
+            first, last = indexes[0], indexes[-1]
+            if min(first, last) < 0 or max(first, last) >= len(outer):
+                raise IndexError('view index out of range')
+            start = outer[first]
+            step = outer.step * indexes.step
+            indexes = range(start, start + step * len(indexes), step)
+        else:
+            indexes = range(0)
+        self.base = base
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SeqView(self.base, self.indexes[index])
+        return self.base[self.indexes[index]]
+
+    def __iter__(self):
+        r = self.indexes
+        if r.step > 0 and r.start <= 8 * len(r):
+            # islice walks the base in C without building an index list,
+            # but from index 0; skipping an item costs about an eighth of
+            # a __getitem__ call, so long prefixes go through map instead
+            return islice(self.base, r.start, r.stop, r.step)
+        return map(self.base.__getitem__, r)
+
+    def __reversed__(self):
+        return iter(self[::-1])
+
+    def __eq__(self, other):
+        # like list == tuple, other kinds of sequence compare unequal
+        if not isinstance(other, (SeqView, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            x == y for x, y in zip(self, other))
+
+    def __repr__(self):
+        r = self.indexes
+        return (f'SeqView(<{type(self.base).__name__} of {len(self.base)}>, '
+                f'range({r.start}, {r.stop}, {r.step}))')
+
+    def _as_slice(self):
+        r = self.indexes
+        if not r:
+            return slice(0, 0)
+        stop = r.stop
+        if stop < 0:
+            # a negative stride that runs past index 0
+            stop = None
+        return slice(r.start, stop, r.step)
+
+    def materialize(self, factory=None):
+        """
+        Copy the viewed items, by default into the base's own type so a
+        view of a list, str or bytes comes back as the same type.
+        """
+        base = self.base
+        if factory is None:
+            try:
+                return base[self._as_slice()]
+            except TypeError:
+                factory = list
+        return factory(self)
+
+
+def view(seq):
+    return SeqView(seq)
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    start_time = time.time()
+    result = func()
+    duration = time.time() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+if __name__ == "__main__":
+    a = list(range(5_000_000))
+
+    def list_slices():
+        # copy per step, as in `b = a[::2]; c = b[1:-1]`
+        b = a[::2]
+        c = b[1:-1]
+        d = c[-1_000_000:]
+        return sum(d)
+
+    def view_slices():
+        v = view(a)[::2][1:-1][-1_000_000:]
+        return sum(v)
+
+    for name, func in [('list slicing', list_slices),
+                       ('SeqView', view_slices)]:
+        result, duration, peak = peak_memory(func)
+        print(f"{name:14} sum={result} {duration:.3f}s "
+              f"peak {peak / 2**20:.1f} MiB")
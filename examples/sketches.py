@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Mergeable streaming summaries beyond `nsmallest(1, a)[0]` and heappop loops
+(E.P.1 i46): bounded memory however long the stream is, batch update(),
+serialization with to_bytes()/from_bytes() and merge() so workers can
+summarize shards and a parent can combine them.
+
+• TopK: the k largest (or smallest) items seen.
+• KLLQuantiles: Karnin-Lang-Liberty quantile sketch; rank error shrinks as
+  1/k (about 1.7% of n at k=200) using O(k) items of memory.
+• StreamStats: count, min, max, sum and mean.
+"""
+
+import heapq
+import math
+import pickle
+import random
+import time
+from bisect import bisect_right
+from itertools import chain
+from multiprocessing import Pool
+
+
+class _Mergeable:
+    def to_bytes(self):
+        return pickle.dumps((type(self).__name__, self.__getstate__()),
+                            pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, data):
+        name, state = pickle.loads(data)
+        if name != cls.__name__:
+            raise ValueError(f'data holds a {name}, not a {cls.__name__}')
+        sketch = cls.__new__(cls)
+        sketch.__setstate__(state)
+        return sketch
+
+    def __getstate__(self):
+        return dict(self.__dict__)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class TopK(_Mergeable):
+    """
+    The k largest items (smallest with largest=False), ordered by `key`.
+    Single adds are buffered and folded in with one heapq.nlargest call
+    per k items, so both add() and update() are amortized O(log k).
+    """
+
+    def __init__(self, k, largest=True, key=None):
+        self.k = k
+        self.largest = largest
+        self.key = key
+        self.items = []
+        self.pending = []
+
+    def __getstate__(self):
+        self._compact()
+        # a lambda key makes pickle raise; use a module-level function,
+        # operator.itemgetter or functools.partial to serialize
+        return dict(self.__dict__)
+
+    def _compact(self):
+        if self.pending:
+            select = heapq.nlargest if self.largest else heapq.nsmallest
+            self.items = select(self.k, chain(self.items, self.pending),
+                                key=self.key)
+            self.pending = []
+
+    def add(self, item):
+        self.pending.append(item)
+        if len(self.pending) >= max(self.k, 64):
+            self._compact()
+
+    def update(self, items):
+        self.pending.extend(items)
+        self._compact()
+
+    def merge(self, other):
+        self.update(other.result())
+        return self
+
+    def result(self):
+        """Best first."""
+        self._compact()
+        return list(self.items)
+
+    def __len__(self):
+        self._compact()
+        return len(self.items)
+
+
+class KLLQuantiles(_Mergeable):
+    """
+    A stack of compactors: level h holds items of weight 2**h. A full level
+    is sorted and every other item, from a random offset, is promoted to the
+    next level, so memory stays O(k) while every item keeps an unbiased
+    share of the rank.
+    """
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.rng = random.Random(seed)
+        self.levels = []
+        self.size = 0
+        self.count = 0
+        self._grow()
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * self.c ** depth))
+
+    def _grow(self):
+        self.levels.append([])
+        self.max_size = sum(map(self._capacity, range(len(self.levels))))
+
+    def _compress(self):
+        for level, items in enumerate(self.levels):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self._grow()
+                items.sort()
+                odd = items.pop() if len(items) % 2 else None
+                offset = self.rng.random() < 0.5
+                self.levels[level + 1].extend(items[offset::2])
+                items[:] = [] if odd is None else [odd]
+                self.size = sum(map(len, self.levels))
+                return
+
+    def add(self, value):
+        self.levels[0].append(value)
+        self.size += 1
+        self.count += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def update(self, values):
+        before = len(self.levels[0])
+        self.levels[0].extend(values)
+        added = len(self.levels[0]) - before
+        self.size += added
+        self.count += added
+        while self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for items, theirs in zip(self.levels, other.levels):
+            items.extend(theirs)
+        self.size = sum(map(len, self.levels))
+        self.count += other.count
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def _weighted(self):
+        return sorted((value, 1 << level)
+                      for level, items in enumerate(self.levels)
+                      for value in items)
+
+    def rank(self, value):
+        """Estimated number of items <= value."""
+        return sum(1 << level for level, items in enumerate(self.levels)
+                   for item in items if item <= value)
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """Estimated values at each fraction in `qs` (0 <= q <= 1)."""
+        weighted = self._weighted()
+        if not weighted:
+            raise ValueError('no data')
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for q in qs:
+            target = q * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results.append(value)
+        return results
+
+
+class StreamStats(_Mergeable):
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.update((value,))
+
+    def update(self, values):
+        values = values if isinstance(values, (list, tuple)) \
+            else list(values)
+        if not values:
+            return
+        self.count += len(values)
+        self.total += sum(values)
+        low, high = min(values), max(values)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        if other.count:
+            self.min = other.min if self.min is None \
+                else min(self.min, other.min)
+            self.max = other.max if self.max is None \
+                else max(self.max, other.max)
+            self.count += other.count
+            self.total += other.total
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+def shard_values(shard, n=200_000):
+    rng = random.Random(shard)
+    return [rng.lognormvariate(0, 1) for _ in range(n)]
+
+
+def summarize(shard):
+    """Worker: sketch one shard and return the serialized sketches."""
+    values = shard_values(shard)
+    sketches = (TopK(5), KLLQuantiles(200, seed=shard), StreamStats())
+    for sketch in sketches:
+        sketch.update(values)
+    return [sketch.to_bytes() for sketch in sketches]
+
+
+if __name__ == "__main__":
+    shards = range(8)
+    start_time = time.time()
+    with Pool() as pool:
+        results = pool.map(summarize, shards)
+    top, quantiles, stats = (TopK(5), KLLQuantiles(200, seed=0),
+                             StreamStats())
+    for serialized in results:
+        top.merge(TopK.from_bytes(serialized[0]))
+        quantiles.merge(KLLQuantiles.from_bytes(serialized[1]))
+        stats.merge(StreamStats.from_bytes(serialized[2]))
+    duration = time.time() - start_time
+
+    exact = sorted(chain.from_iterable(map(shard_values, shards)))
+    n = len(exact)
+    print(f"{n} values in {len(results)} shards, merged in {duration:.2f}s")
+    print(f"count {stats.count}, min {stats.min:.4f} (exact "
+          f"{exact[0]:.4f}), max {stats.max:.4f}, mean {stats.mean:.4f}")
+    print(f"top 5 match exact: {top.result() == exact[:-6:-1]}")
+    kept = sum(map(len, quantiles.levels))
+    print(f"quantiles from {kept} kept items:")
+    qs = (0.5, 0.9, 0.99)
+    for q, estimate in zip(qs, quantiles.quantiles(qs)):
+        true_rank = bisect_right(exact, estimate) / n
+        print(f"  p{q * 100:g}: {estimate:.4f} (exact "
+              f"{exact[int(q * n)]:.4f}), rank error {abs(true_rank - q):.4f}")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Sparse matrices for `matrix`/`vec` shaped data that is mostly zeros
+(see the list-of-lists examples in data_structures.py).
+
+A dense list of lists stores every zero as a pointer. SparseMatrix stores
+only the non-zeros in compressed rows (CSR) or columns (CSC):
+
+    indptr[i]:indptr[i + 1]   slice of row i (CSR) or column i (CSC)
+    indices                   column (CSR) or row (CSC) of each value
+    data                      the values
+
+all held in array buffers. NumPy is used for the bulk work when it is
+installed and wraps those buffers without copying; otherwise everything
+runs in pure Python.
+"""
+
+import random
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from operator import mul
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _compress(major, minor, values, n_major):
+    """
+    Sort COO triples by (major, minor), sum duplicates and return the
+    compressed (indptr, indices, data) arrays.
+    """
+    if numpy is not None and len(values):
+        major = numpy.asarray(major, dtype=numpy.int64)
+        minor = numpy.asarray(minor, dtype=numpy.int64)
+        values = numpy.asarray(values, dtype=numpy.float64)
+        order = numpy.lexsort((minor, major))
+        major, minor, values = major[order], minor[order], values[order]
+        starts = numpy.ones(len(major), dtype=bool)
+        starts[1:] = (major[1:] != major[:-1]) | (minor[1:] != minor[:-1])
+        first = numpy.flatnonzero(starts)
+        data = numpy.add.reduceat(values, first)
+        major, minor = major[first], minor[first]
+        counts = numpy.bincount(major, minlength=n_major)
+        indptr = numpy.zeros(n_major + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=indptr[1:])
+        return (array('q', indptr.tobytes()), array('q', minor.tobytes()),
+                array('d', data.tobytes()))
+    indptr = array('q', bytes(8 * (n_major + 1)))
+    indices = array('q')
+    data = array('d')
+    last = None
+    for key in sorted(zip(major, minor, values)):
+        if key[:2] == last:
+            data[-1] += key[2]
+            continue
+        last = key[:2]
+        indptr[key[0] + 1] += 1
+        indices.append(key[1])
+        data.append(key[2])
+    for i in range(n_major):
+        indptr[i + 1] += indptr[i]
+    return indptr, indices, data
+
+
+def _expand(indptr):
+    """Major index of every stored value, the inverse of compressing."""
+    if numpy is not None:
+        counts = numpy.diff(numpy.frombuffer(indptr, dtype=numpy.int64))
+        return numpy.repeat(numpy.arange(len(counts)), counts)
+    major = array('q')
+    for i in range(len(indptr) - 1):
+        major.extend([i] * (indptr[i + 1] - indptr[i]))
+    return major
+
+
+class SparseMatrix:
+    """
+    Matrix of `shape` in 'csr' or 'csc' `format`.
+    Build with from_coo() or from_dense() rather than by hand.
+    """
+
+    def __init__(self, shape, format, indptr, indices, data):
+        if format not in ('csr', 'csc'):
+            raise ValueError(f"format must be 'csr' or 'csc', not {format!r}")
+        self.shape = shape
+        self.format = format
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_coo(cls, rows, cols, values, shape, format='csr'):
+        """Build from (row, col, value) triples; duplicates are summed."""
+        n_rows, n_cols = shape
+        if format == 'csr':
+            parts = _compress(rows, cols, values, n_rows)
+        else:
+            parts = _compress(cols, rows, values, n_cols)
+        return cls(shape, format, *parts)
+
+    @classmethod
+    def from_dense(cls, matrix, format='csr'):
+        rows, cols, values = [], [], []
+        for i, row in enumerate(matrix):
+            for j, value in enumerate(row):
+                if value:
+                    rows.append(i)
+                    cols.append(j)
+                    values.append(value)
+        shape = (len(matrix), len(matrix[0]) if matrix else 0)
+        return cls.from_coo(rows, cols, values, shape, format)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def nbytes(self):
+        return sum(buf.itemsize * len(buf)
+                   for buf in (self.indptr, self.indices, self.data))
+
+    def __repr__(self):
+        return (f'SparseMatrix({self.shape[0]}x{self.shape[1]}, '
+                f'{self.format}, nnz={self.nnz})')
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def transpose(self):
+        """
+        O(1): the CSR arrays of a matrix are the CSC arrays of its
+        transpose, so only the shape and the format label change.
+        """
+        n_rows, n_cols = self.shape
+        return SparseMatrix((n_cols, n_rows),
+                            'csc' if self.format == 'csr' else 'csr',
+                            self.indptr, self.indices, self.data)
+
+    def _convert(self):
+        n_rows, n_cols = self.shape
+        n_minor = n_cols if self.format == 'csr' else n_rows
+        parts = _compress(self.indices, _expand(self.indptr), self.data,
+                          n_minor)
+        return SparseMatrix(self.shape,
+                            'csc' if self.format == 'csr' else 'csr', *parts)
+
+    def tocsr(self):
+        return self if self.format == 'csr' else self._convert()
+
+    def tocsc(self):
+        return self if self.format == 'csc' else self._convert()
+
+    def matvec(self, x):
+        """self @ x for a dense vector x, returned as array('d')."""
+        n_rows, n_cols = self.shape
+        if len(x) != n_cols:
+            raise ValueError(f'vector of length {len(x)} does not match '
+                             f'{n_cols} columns')
+        indptr, indices, data = self.indptr, self.indices, self.data
+        if numpy is not None:
+            x = numpy.asarray(x, dtype=numpy.float64)
+            values = numpy.frombuffer(data, dtype=numpy.float64)
+            minor = numpy.frombuffer(indices, dtype=numpy.int64)
+            major = _expand(indptr)
+            if self.format == 'csr':
+                y = numpy.bincount(major, weights=values * x[minor],
+                                   minlength=n_rows)
+            else:
+                y = numpy.bincount(minor, weights=values * x[major],
+                                   minlength=n_rows)
+            return array('d', y.tobytes())
+        if self.format == 'csr':
+            y = array('d', bytes(8 * n_rows))
+            for i in range(n_rows):
+                start, stop = indptr[i], indptr[i + 1]
+                if start != stop:
+                    y[i] = sum(map(mul, data[start:stop],
+                                   map(x.__getitem__, indices[start:stop])))
+            return y
+        y = [0.0] * n_rows
+        for j in range(n_cols):
+            xj = x[j]
+            if xj:
+                for k in range(indptr[j], indptr[j + 1]):
+                    y[indices[k]] += data[k] * xj
+        return array('d', y)
+
+    def __matmul__(self, x):
+        return self.matvec(x)
+
+    def __getitem__(self, key):
+        """m[i, j] for one value, m[a:b] for a CSR block of rows."""
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError('row slices must have step 1')
+            return self.row_slice(key.start, key.stop)
+        i, j = key
+        n_rows, n_cols = self.shape
+        if i < 0:
+            i += n_rows
+        if j < 0:
+            j += n_cols
+        if not (0 <= i < n_rows and 0 <= j < n_cols):
+            raise IndexError('matrix index out of range')
+        if self.format == 'csc':
+            i, j = j, i
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        k = bisect_left(self.indices, j, start, stop)
+        if k < stop and self.indices[k] == j:
+            return self.data[k]
+        return 0.0
+
+    def row_slice(self, start=None, stop=None):
+        m = self.tocsr()
+        start, stop, _ = slice(start, stop).indices(m.shape[0])
+        stop = max(start, stop)
+        lo, hi = m.indptr[start], m.indptr[stop]
+        indptr = array('q', (p - lo for p in m.indptr[start:stop + 1]))
+        return SparseMatrix((stop - start, m.shape[1]), 'csr', indptr,
+                            m.indices[lo:hi], m.data[lo:hi])
+
+    def flatten(self):
+        """
+        1 x (rows * cols) matrix, the sparse form of
+        [num for elem in vec for num in elem].
+        """
+        m = self.tocsr()
+        n_rows, n_cols = m.shape
+        rows = _expand(m.indptr)
+        indices = array('q', (i * n_cols + j
+                              for i, j in zip(rows, m.indices)))
+        return SparseMatrix((1, n_rows * n_cols), 'csr',
+                            array('q', [0, len(m.data)]), indices,
+                            array('d', m.data))
+
+    def todense(self):
+        n_rows, n_cols = self.shape
+        dense = [[0.0] * n_cols for _ in range(n_rows)]
+        m = self.tocsr()
+        for i in range(n_rows):
+            row = dense[i]
+            for k in range(m.indptr[i], m.indptr[i + 1]):
+                row[m.indices[k]] = m.data[k]
+        return dense
+
+
+def dense_matvec(matrix, x):
+    return [sum(a * b for a, b in zip(row, x)) for row in matrix]
+
+
+if __name__ == "__main__":
+    n, density = 2_000, 0.005
+    rng = random.Random(0)
+    tracemalloc.start()
+    dense = [[rng.random() if rng.random() < density else 0.0
+              for _ in range(n)] for _ in range(n)]
+    dense_bytes = tracemalloc.get_traced_memory()[0]
+    m = SparseMatrix.from_dense(dense)
+    tracemalloc.stop()
+    x = [rng.random() for _ in range(n)]
+    print(f"{n}x{n}, nnz={m.nnz}, numpy={'yes' if numpy else 'no'}")
+    print(f"memory: dense lists {dense_bytes / 2**20:.1f} MiB, "
+          f"CSR {m.nbytes() / 2**20:.3f} MiB")
+
+    for name, func in [('dense matvec', lambda: dense_matvec(dense, x)),
+                       ('CSR matvec', lambda: m @ x),
+                       ('CSC matvec', lambda: m.tocsc() @ x),
+                       ('transpose', lambda: m.T),
+                       ('CSR -> CSC', m.tocsc),
+                       ('dense flatten', lambda: [num for elem in dense
+                                                  for num in elem]),
+                       ('sparse flatten', m.flatten)]:
+        start_time = time.time()
+        func()
+        duration = time.time() - start_time
+        print(f"{name:16} {duration * 1e3:9.3f} ms")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+itertools.tee that spills to disk (see the iterator tools notes at the end of
+data_structures.py).
+
+tee keeps every item the slowest consumer has not seen yet, so one consumer
+running far ahead buffers the whole iterator. spill_tee keeps at most
+`memory_limit` items in memory and appends older ones to a temporary file
+as length-prefixed records; lagging consumers read them back sequentially.
+"""
+
+import pickle
+import struct
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from itertools import tee
+
+_LENGTH = struct.Struct('<Q')
+_CHUNK = 1 << 16
+_MISSING = object()
+
+
+def _raw_bytes(item):
+    # bytes(n) would make n zero bytes out of an int, so accept only
+    # objects with the buffer protocol
+    if type(item) is bytes:
+        return item
+    try:
+        return bytes(memoryview(item))
+    except TypeError:
+        raise TypeError(f"the 'bytes' format needs bytes-like items, not "
+                        f"{type(item).__name__}") from None
+
+
+FORMATS = {
+    # name: (encode, decode)
+    'pickle': (lambda item: pickle.dumps(item, pickle.HIGHEST_PROTOCOL),
+               pickle.loads),
+    'bytes': (_raw_bytes, bytes),
+}
+
+
+class _SpillBuffer:
+    """
+    Items [mem_base, produced) live in `memory`, items before mem_base that a
+    consumer still needs live in the spill file. Consumers only move forward,
+    so each one just needs its own read offset into the file.
+    """
+
+    def __init__(self, iterable, memory_limit, format):
+        try:
+            self.encode, self.decode = FORMATS[format]
+        except KeyError:
+            raise ValueError(f'unknown format {format!r}, expected one of '
+                             f'{sorted(FORMATS)}') from None
+        self.source = iter(iterable)
+        self.memory_limit = max(1, memory_limit)
+        self.memory = deque()
+        self.mem_base = 0
+        self.produced = 0
+        self.exhausted = False
+        self.file = None
+        self.file_size = 0
+        # False once a read has moved the shared handle away from the end
+        self.at_end = True
+        self.consumers = []
+        self.spilled = 0
+
+    def pull(self):
+        if self.exhausted:
+            return False
+        item = next(self.source, _MISSING)
+        if item is _MISSING:
+            self.exhausted = True
+            return False
+        self.memory.append(item)
+        self.produced += 1
+        return True
+
+    def spill(self):
+        item = self.memory.popleft()
+        index = self.mem_base
+        self.mem_base += 1
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        payload = self.encode(item)
+        offset = self.file_size
+        if not self.at_end:
+            self.file.seek(offset)
+            self.at_end = True
+        self.file.write(_LENGTH.pack(len(payload)))
+        self.file.write(payload)
+        self.file_size += _LENGTH.size + len(payload)
+        self.spilled += 1
+        # the consumer waiting on this item now has to find it on disk
+        for consumer in self.consumers:
+            if consumer.position == index:
+                consumer.seek(offset)
+
+    def read(self, offset, size):
+        self.at_end = False
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def trim(self):
+        positions = [c.position for c in self.consumers]
+        lowest = min(positions) if positions else self.produced
+        memory = self.memory
+        while memory and self.mem_base < lowest:
+            memory.popleft()
+            self.mem_base += 1
+        while len(memory) > self.memory_limit:
+            self.spill()
+        if self.file_size and lowest >= self.mem_base:
+            # nobody reads from disk any more; reuse the file from the start
+            self.file.seek(0)
+            self.file.truncate()
+            self.file_size = 0
+            self.at_end = True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SpillTeeIterator:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.position = buffer.mem_base
+        self.chunk = b''
+        self.chunk_start = 0
+        self.offset = 0
+        buffer.consumers.append(self)
+
+    def __iter__(self):
+        return self
+
+    def seek(self, offset):
+        self.offset = offset
+        self.chunk = b''
+
+    def _read_disk(self, size):
+        buffer = self.buffer
+        start = self.offset - self.chunk_start
+        if not self.chunk or start < 0 or start + size > len(self.chunk):
+            self.chunk = buffer.read(self.offset, max(size, _CHUNK))
+            self.chunk_start = self.offset
+            start = 0
+        self.offset += size
+        return self.chunk[start:start + size]
+
+    def __next__(self):
+        buffer = self.buffer
+        if buffer is None:
+            raise StopIteration
+        position = self.position
+        if position < buffer.mem_base:
+            (size,) = _LENGTH.unpack(self._read_disk(_LENGTH.size))
+            item = buffer.decode(self._read_disk(size))
+        else:
+            if position == buffer.produced and not buffer.pull():
+                self.close()
+                raise StopIteration
+            item = buffer.memory[position - buffer.mem_base]
+        self.position = position + 1
+        buffer.trim()
+        return item
+
+    def close(self):
+        buffer = self.buffer
+        if buffer is None:
+            return
+        self.buffer = None
+        buffer.consumers.remove(self)
+        if buffer.consumers:
+            buffer.trim()
+        else:
+            buffer.close()
+
+    def __del__(self):
+        self.close()
+
+
+def spill_tee(iterable, n=2, memory_limit=10_000, format='pickle'):
+    """
+    Split `iterable` into `n` independent iterators like itertools.tee.
+    Args:
+        memory_limit: most items (a count, not a size in bytes) held in
+            memory at once; the rest of the gap between the fastest and slowest consumer goes to disk.
+        format: 'pickle' for any picklable item, 'bytes' for bytes-like
+            items stored as raw length-prefixed records.
+    """
+    buffer = _SpillBuffer(iterable, memory_limit, format)
+    return tuple(SpillTeeIterator(buffer) for _ in range(n))
+
+
+def records(n):
+    for i in range(n):
+        yield (i, str(i) * 8)
+
+
+def drift_apart(split, n):
+    fast, slow = split(records(n))
+    # the fast consumer reads everything before the slow one starts
+    return sum(i for i, _ in fast) + sum(i for i, _ in slow)
+
+
+if __name__ == "__main__":
+    n = 500_000
+    for name, split in [('itertools.tee', lambda it: tee(it, 2)),
+                        ('spill_tee', lambda it: spill_tee(it, 2, 1000))]:
+        start_time = time.time()
+        total = drift_apart(split, n)
+        duration = time.time() - start_time
+        # tracemalloc slows allocation down, so memory gets its own run
+        tracemalloc.start()
+        drift_apart(split, n)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:14} {duration:.3f}s  peak {peak / 2**20:6.1f} MiB  "
+              f"total {total}")
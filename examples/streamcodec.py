@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Streaming versions of to_str / to_bytes from string.py (E.P.1 i3), for
+inputs too big to hold as one str:
+
+    with open('workfile') as f:
+        read_data = f.read()          # the whole file as one str
+
+becomes a loop over text chunks whose memory does not grow with the file:
+
+    with open('workfile', 'rb') as f:
+        for text in iter_decode(read_chunks(f)):
+            ...
+
+• read_chunks() fills one reused bytearray with readinto() and yields
+  memoryviews of it, so reading allocates nothing per chunk.
+• StreamDecoder wraps codecs.getincrementaldecoder: a multi-byte
+  character split across two chunks is held back (at most a few bytes)
+  and completed from the start of the next chunk. bytes, bytearray and
+  memoryview input is decoded in place; the UTF-8/16/32 decoders are
+  called on a memoryview of the chunk instead of `buffer + chunk`, which
+  would copy it.
+• ASCII fast path: for single- and multi-byte legacy codecs (cp1252,
+  koi8-r, shift_jis, gb18030 ...) a chunk that is pure ASCII is
+  converted with the ASCII codec, a widening copy, instead of the
+  table-driven decoder, 7-30x faster. UTF-8 and Latin-1 already decode
+  ASCII at that speed; stateful codecs (iso2022, utf-7, hz) are excluded,
+  since there ASCII bytes can mean other characters.
+• StreamEncoder / iter_encode go the other way, and transcode() pipes a
+  binary file through both in constant memory.
+"""
+
+import codecs
+import os
+import resource
+import tempfile
+import time
+from functools import lru_cache
+
+_ASCII = bytes(range(128))
+# codecs whose own ASCII handling is already a plain copy, or for which
+# ASCII bytes do not always mean ASCII characters
+_NO_FAST_PATH = ('ascii', 'iso8859-1', 'hz', 'utf', 'iso2022')
+# longest byte sequence of one character in the buffered (UTF) codecs
+_SPLIT_MAX = 8
+
+
+@lru_cache(maxsize=None)
+def _ascii_fast_path(encoding):
+    """Whether pure-ASCII data can bypass this codec."""
+    name = codecs.lookup(encoding).name
+    if name.startswith(_NO_FAST_PATH):
+        return False
+    try:
+        return (codecs.decode(_ASCII, name) == _ASCII.decode('ascii')
+                and codecs.encode(_ASCII.decode('ascii'), name) == _ASCII)
+    except UnicodeError:
+        return False
+
+
+class StreamDecoder:
+    """
+    Incremental decoder for bytes-like chunks.
+    Args:
+        encoding: any codec with an incremental decoder.
+        errors: 'strict', 'replace', 'ignore' ...
+    """
+
+    def __init__(self, encoding='utf-8', errors='strict'):
+        self.encoding = encoding
+        self.errors = errors
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors)
+        self._fast_path = _ascii_fast_path(encoding)
+        self._buffered = isinstance(self.decoder,
+                                    codecs.BufferedIncrementalDecoder)
+
+    def decode(self, data, final=False):
+        """The text of `data`; an incomplete trailing character waits."""
+        decoder = self.decoder
+        if self._fast_path and not decoder.getstate()[0]:
+            if isinstance(data, (bytes, bytearray)):
+                if data.isascii():
+                    return str(data, 'ascii')
+            else:
+                try:
+                    return str(data, 'ascii')
+                except UnicodeDecodeError:
+                    pass
+        if not self._buffered:
+            return decoder.decode(data, final)
+        return self._decode_buffered(memoryview(data).cast('B'), final)
+
+    def _decode_buffered(self, view, final):
+        # BufferedIncrementalDecoder.decode does `self.buffer + data`; here
+        # only the held-back bytes and the first few of `view` are joined
+        decoder = self.decoder
+        head = ''
+        pending = decoder.buffer
+        if pending:
+            if len(view) <= _SPLIT_MAX:
+                return decoder.decode(bytes(view), final)
+            joined = pending + bytes(view[:_SPLIT_MAX])
+            head, used = decoder._buffer_decode(joined, self.errors, False)
+            used -= len(pending)
+            if used < 0:
+                # still incomplete: fall back to the copying path
+                decoder.buffer = b''
+                return head + decoder.decode(joined[used + len(pending):]
+                                             + view[_SPLIT_MAX:], final)
+            view = view[used:]
+        text, used = decoder._buffer_decode(view, self.errors, final)
+        decoder.buffer = bytes(view[used:])
+        return head + text
+
+    def reset(self):
+        self.decoder.reset()
+
+
+class StreamEncoder:
+    """Incremental encoder for str chunks, with the same ASCII fast path."""
+
+    def __init__(self, encoding='utf-8', errors='strict'):
+        self.encoding = encoding
+        self.errors = errors
+        self.encoder = codecs.getincrementalencoder(encoding)(errors)
+        self._fast_path = _ascii_fast_path(encoding)
+
+    def encode(self, text, final=False):
+        # str.isascii() reads a flag of the str object, it does not scan
+        if self._fast_path and text.isascii() and not self.encoder.getstate():
+            return text.encode('ascii')
+        return self.encoder.encode(text, final)
+
+    def reset(self):
+        self.encoder.reset()
+
+
+def read_chunks(binary_file, chunk_size=1 << 20):
+    """
+    Memoryviews of successive chunks of binary_file. All share one buffer:
+    each is valid until the next one is requested.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    readinto = binary_file.readinto
+    while True:
+        size = readinto(buffer)
+        if not size:
+            return
+        yield view[:size]
+
+
+def iter_decode(chunks, encoding='utf-8', errors='strict'):
+    """Text chunks decoded from an iterable of bytes-like chunks."""
+    decoder = StreamDecoder(encoding, errors)
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_encode(texts, encoding='utf-8', errors='strict'):
+    """bytes chunks encoded from an iterable of str chunks."""
+    encoder = StreamEncoder(encoding, errors)
+    for text in texts:
+        data = encoder.encode(text)
+        if data:
+            yield data
+    data = encoder.encode('', final=True)
+    if data:
+        yield data
+
+
+def transcode(source, target, source_encoding='utf-8',
+              target_encoding='utf-8', errors='strict', chunk_size=1 << 20):
+    """
+    Re-encode binary file `source` into binary file `target` chunk by
+    chunk. Returns the number of bytes written.
+    """
+    written = 0
+    for data in iter_encode(iter_decode(read_chunks(source, chunk_size),
+                                        source_encoding, errors),
+                            target_encoding, errors):
+        written += target.write(data)
+    return written
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss >> 10
+
+
+if __name__ == "__main__":
+    line = 'Grüße, 日本語 and some plain ASCII text to pad the line out\n'
+    repeats = 4_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'workfile')
+        with open(path, 'w', encoding='utf-8') as f:
+            for _ in range(repeats // 10_000):
+                f.write(line * 10_000)
+        size_mib = os.path.getsize(path) >> 20
+        print(f"{size_mib} MiB of UTF-8, peak RSS before: "
+              f"{peak_rss_mib()} MiB")
+
+        # odd chunk size so characters straddle the chunk boundaries
+        start_time = time.time()
+        characters = 0
+        with open(path, 'rb') as f:
+            for text in iter_decode(read_chunks(f, (1 << 20) + 1)):
+                characters += len(text)
+        assert characters == len(line) * repeats
+        print(f"iter_decode: {characters} characters in "
+              f"{time.time() - start_time:.2f}s, peak RSS "
+              f"{peak_rss_mib()} MiB")
+
+        utf16 = os.path.join(tmp, 'workfile.utf16')
+        start_time = time.time()
+        with open(path, 'rb') as source, open(utf16, 'wb') as target:
+            written = transcode(source, target, 'utf-8', 'utf-16')
+        print(f"transcode to UTF-16: {written >> 20} MiB in "
+              f"{time.time() - start_time:.2f}s, peak RSS "
+              f"{peak_rss_mib()} MiB")
+        with open(utf16, 'rb') as f:
+            head = next(iter_decode(read_chunks(f, 4096), 'utf-16'))
+        assert head.startswith(line)
+
+        ascii_text = 'plain ASCII log line, status=200 bytes=5120\n' * 25_000
+        cp1252 = ascii_text.encode('cp1252')
+        for label, decoder in (
+                ('cp1252 incremental decoder',
+                 codecs.getincrementaldecoder('cp1252')()),
+                ('StreamDecoder, ASCII fast path', StreamDecoder('cp1252'))):
+            start_time = time.time()
+            for _ in range(100):
+                assert len(decoder.decode(cp1252)) == len(ascii_text)
+            print(f"{label}: {100 * len(cp1252) >> 20} MiB in "
+                  f"{time.time() - start_time:.2f}s")
+
+        start_time = time.time()
+        with open(path, encoding='utf-8') as f:
+            read_data = f.read()
+        print(f"f.read(): {len(read_data)} characters in "
+              f"{time.time() - start_time:.2f}s, peak RSS "
+              f"{peak_rss_mib()} MiB")
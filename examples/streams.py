@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Fused lazy pipelines for the chained generators of E.P.1 i9 and i16.
+
+    roots = ((x, x**0.5) for x in it)
+
+Every generator in a chain adds one frame resume per element. Stream
+collects the stages first and, when iterated, compiles each run of adjacent
+map/filter stages into a single generator, so the plumbing costs one frame
+per element however long the run is.
+
+    Stream(range(10**6)).map(f).filter(p).batch(1024).map_batches(g)
+
+Functions given to a stage after .parallel() are sent to worker processes,
+so they must be picklable (defined at module level).
+"""
+
+import concurrent.futures
+import os
+import time
+from array import array
+from collections import deque
+from itertools import chain, islice
+
+_FUSED = {}
+
+
+def _fuse(kinds):
+    """
+    Build a generator running the map ('m') / filter ('f') stages in
+    `kinds` inside one loop, e.g. 'mfm' becomes
+
+        def fused(src, s0, s1, s2):
+            for x in src:
+                x = s0(x)
+                if not s1(x):
+                    continue
+                yield s2(x)
+    """
+    fused = _FUSED.get(kinds)
+    if fused is not None:
+        return fused
+    names = [f's{i}' for i in range(len(kinds))]
+    lines = [f"def fused(src, {', '.join(names)}):", "    for x in src:"]
+    for kind, name in zip(kinds, names):
+        if kind == 'm':
+            lines.append(f"        x = {name}(x)")
+        else:
+            lines.append(f"        if not {name}(x):")
+            lines.append("            continue")
+    lines.append("        yield x")
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    fused = _FUSED[kinds] = namespace['fused']
+    return fused
+
+
+def _run_segment(segment, iterable):
+    if not segment:
+        return iter(iterable)
+    kinds = ''.join(kind for kind, _ in segment)
+    return _fuse(kinds)(iterable, *(func for _, func in segment))
+
+
+def _run_chunk(segment, chunk):
+    # executed in a worker process
+    return list(_run_segment(segment, chunk))
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _batches(iterable, size, typecode):
+    for chunk in _chunks(iterable, size):
+        yield chunk if typecode is None else array(typecode, chunk)
+
+
+def _parallel(segment, iterable, workers, chunksize):
+    # a bounded window of futures keeps memory flat for unbounded sources,
+    # unlike Executor.map which submits everything up front
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for chunk in _chunks(iterable, chunksize):
+            pending.append(executor.submit(_run_chunk, segment, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class Stream:
+    """
+    Lazy pipeline over `source`. Stage methods return a new Stream, so a
+    partially built pipeline can be reused; nothing runs until iteration.
+    """
+
+    def __init__(self, source, stages=()):
+        self.source = source
+        self.stages = tuple(stages)
+
+    def _then(self, *stage):
+        return Stream(self.source, self.stages + (stage,))
+
+    def map(self, func):
+        return self._then('m', func)
+
+    def filter(self, predicate):
+        return self._then('f', predicate)
+
+    def batch(self, size, typecode=None):
+        """
+        Group items into lists of `size`, or into array(typecode) buffers
+        that NumPy can wrap without copying (numpy.frombuffer).
+        """
+        return self._then('batch', size, typecode)
+
+    def map_batches(self, func):
+        """Apply a vectorized `func` to each batch; must follow batch()."""
+        if not any(stage[0] == 'batch' for stage in self.stages):
+            raise ValueError('map_batches() needs a preceding batch()')
+        return self._then('m', func)
+
+    def flatten(self):
+        """Undo batch(): yield the items of each batch."""
+        return self._then('flatten')
+
+    def parallel(self, workers=None, chunksize=1024):
+        """
+        Run the map/filter stages since the previous batch, flatten or
+        parallel stage in a pool of `workers` processes, keeping order.
+        """
+        return self._then('parallel', workers or os.cpu_count(), chunksize)
+
+    def __iter__(self):
+        it = self.source
+        segment = []
+        for stage in self.stages:
+            kind = stage[0]
+            if kind in ('m', 'f'):
+                segment.append(stage)
+                continue
+            if kind == 'parallel':
+                it = _parallel(segment, it, stage[1], stage[2])
+            else:
+                it = _run_segment(segment, it)
+                if kind == 'batch':
+                    it = _batches(it, stage[1], stage[2])
+                elif kind == 'flatten':
+                    it = chain.from_iterable(it)
+            segment = []
+        return _run_segment(segment, it)
+
+    def collect(self):
+        return list(self)
+
+
+def square(x):
+    return x * x
+
+
+def not_multiple_of_3(x):
+    return x % 3
+
+
+def add_one(x):
+    return x + 1
+
+
+def batch_sum(batch):
+    return sum(batch)
+
+
+def slow_square(x):
+    return sum(x * x for _ in range(2000)) // 2000
+
+
+if __name__ == "__main__":
+    n = 2_000_000
+
+    def hand_chained():
+        a = (square(x) for x in range(n))
+        b = (x for x in a if not_multiple_of_3(x))
+        c = (add_one(x) for x in b)
+        return sum(c)
+
+    def builtin_chained():
+        return sum(map(add_one, filter(not_multiple_of_3,
+                                       map(square, range(n)))))
+
+    def fused():
+        return sum(Stream(range(n)).map(square).filter(not_multiple_of_3)
+                   .map(add_one))
+
+    def fused_batches():
+        return sum(Stream(range(n)).map(square).filter(not_multiple_of_3)
+                   .map(add_one).batch(4096, 'q').map_batches(batch_sum))
+
+    for func in (hand_chained, builtin_chained, fused, fused_batches):
+        start_time = time.time()
+        result = func()
+        duration = time.time() - start_time
+        print(f"{func.__name__:16} {duration:.3f}s  {n / duration / 1e6:.1f}M "
+              f"items/s  result {result}")
+
+    items = range(5_000)
+    for name, stream in [
+            ('serial', Stream(items).map(slow_square)),
+            ('parallel(4)', Stream(items).map(slow_square).parallel(4))]:
+        start_time = time.time()
+        result = sum(stream)
+        duration = time.time() - start_time
+        print(f"{name:16} {duration:.3f}s  result {result}")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Sliding-window aggregates on top of collections.deque (E.P.1 i46).
+
+Calling min(window) or sum(window) after every event costs O(window). The
+classes here update their aggregate as values enter and leave, so push and
+evict are amortized O(1):
+
+• WindowMin / WindowMax keep a monotonic deque of candidates.
+• WindowSum keeps a running total; WindowStats a running mean and
+  variance (Welford's update, run forwards on push and backwards on evict).
+
+Every window is either count-based, `size=` last values, or time-based,
+`span=` seconds, evicting values whose timestamp is older than the newest
+timestamp minus span.
+"""
+
+import math
+import random
+import time
+from collections import deque
+from itertools import islice
+
+
+class SlidingWindow:
+    """
+    Base class: keeps the raw values and calls `_add(value, seq)` /
+    `_remove(value, seq)`, where seq numbers the values in push order.
+    """
+
+    def __init__(self, size=None, span=None, clock=time.monotonic):
+        if (size is None) == (span is None):
+            raise ValueError('give exactly one of size= or span=')
+        self.size = size
+        self.span = span
+        self.clock = clock
+        self.pushed = 0
+        # values, or (timestamp, value) pairs for time-based windows
+        self.items = deque()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        if self.span is None:
+            return iter(self.items)
+        return (value for _, value in self.items)
+
+    def push(self, value, timestamp=None):
+        seq = self.pushed
+        self.pushed = seq + 1
+        if self.span is None:
+            self.items.append(value)
+            self._add(value, seq)
+            if len(self.items) > self.size:
+                self._remove(self.items.popleft(), seq - self.size)
+        else:
+            if timestamp is None:
+                timestamp = self.clock()
+            self.items.append((timestamp, value))
+            self._add(value, seq)
+            self.expire(timestamp)
+
+    def push_many(self, values, timestamps=None):
+        if timestamps is None:
+            for value in values:
+                self.push(value)
+        else:
+            for value, timestamp in zip(values, timestamps):
+                self.push(value, timestamp)
+
+    def expire(self, now=None):
+        """Evict values older than `now` - span (time-based windows)."""
+        if self.span is None:
+            return
+        if now is None:
+            now = self.clock()
+        items = self.items
+        cutoff = now - self.span
+        while items and items[0][0] <= cutoff:
+            self._remove(items.popleft()[1], self.pushed - len(items) - 1)
+
+    def _add(self, value, seq):
+        raise NotImplementedError
+
+    def _remove(self, value, seq):
+        raise NotImplementedError
+
+
+class _Extreme(SlidingWindow):
+    """
+    Monotonic deque of (seq, value): a value is dropped as soon as a newer
+    value beats it, since it can never be the extreme again.
+    """
+
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self.candidates = deque()
+
+    def _beats(self, new, old):
+        raise NotImplementedError
+
+    def _add(self, value, seq):
+        candidates = self.candidates
+        beats = self._beats
+        while candidates and beats(value, candidates[-1][1]):
+            candidates.pop()
+        candidates.append((seq, value))
+
+    def _remove(self, value, seq):
+        if self.candidates and self.candidates[0][0] == seq:
+            self.candidates.popleft()
+
+    @property
+    def value(self):
+        if not self.candidates:
+            raise ValueError('empty window')
+        return self.candidates[0][1]
+
+
+class WindowMin(_Extreme):
+    def _beats(self, new, old):
+        return new <= old
+
+
+class WindowMax(_Extreme):
+    def _beats(self, new, old):
+        return new >= old
+
+
+class WindowSum(SlidingWindow):
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self.total = 0
+
+    def _add(self, value, seq):
+        self.total += value
+
+    def _remove(self, value, seq):
+        self.total -= value
+
+    @property
+    def mean(self):
+        if not self.items:
+            raise ValueError('empty window')
+        return self.total / len(self.items)
+
+    def push_many(self, values, timestamps=None):
+        if self.span is not None or timestamps is not None:
+            return super().push_many(values, timestamps)
+        # count-based: take the tail that survives and sum both ends in C
+        values = list(values)
+        items = self.items
+        items.extend(values)
+        self.pushed += len(values)
+        self.total += sum(values)
+        excess = len(items) - self.size
+        if excess > 0:
+            self.total -= sum(items.popleft() for _ in range(excess))
+
+
+class WindowStats(SlidingWindow):
+    """Running count, mean and variance of the window."""
+
+    def __init__(self, *args, **kwds):
+        super().__init__(*args, **kwds)
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _add(self, value, seq):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def _remove(self, value, seq):
+        self.count -= 1
+        if not self.count:
+            self.mean = self._m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self._m2 -= delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """Sample variance; needs at least two values."""
+        if self.count < 2:
+            raise ValueError('variance needs at least two values')
+        return max(self._m2, 0.0) / (self.count - 1)
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+
+if __name__ == "__main__":
+    n = 50_000
+    rng = random.Random(0)
+    values = [rng.random() for _ in range(n)]
+    for size in (100, 1_000, 10_000):
+        window = deque(maxlen=size)
+        start_time = time.time()
+        for value in values:
+            window.append(value)
+            min(window), max(window), sum(window) / len(window)
+        recompute = time.time() - start_time
+
+        low, high, total = (WindowMin(size=size), WindowMax(size=size),
+                            WindowSum(size=size))
+        start_time = time.time()
+        for value in values:
+            low.push(value)
+            high.push(value)
+            total.push(value)
+            low.value, high.value, total.mean
+        incremental = time.time() - start_time
+        print(f"window {size:6d}: recompute {recompute:.3f}s, "
+              f"incremental {incremental:.3f}s")
+
+    total = WindowSum(size=1_000)
+    start_time = time.time()
+    for start in range(0, n, 10_000):
+        total.push_many(islice(values, start, start + 10_000))
+    print(f"WindowSum.push_many of {n} values: {time.time() - start_time:.3f}s")
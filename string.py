@@ -18,6 +18,7 @@ f'The value of pi is approximately {math.pi:.3f}.'
 table = {'Sjoerd': 4127, 'Jack': 4098, 'Dcab': 7678}
 for name, phone in table.items():
     print(f'{name:10} ==> {phone:10d}')
+# millions of rows: examples/tablewriter.py formats chunks and buffers writes
 
 animals = 'eels'
 # '!a' applies ascii(), '!s' applies str(), and '!r' applies repr()
@@ -37,6 +38,7 @@ table = {'Sjoerd': 4127, 'Jack': 4098, 'Dcab': 8637678}
 print('Jack: {0[Jack]:d}; Sjoerd: {0[Sjoerd]:d}; '
               'Dcab: {0[Dcab]:d}'.format(table))
 print('Jack: {Jack:d}; Sjoerd: {Sjoerd:d}; Dcab: {Dcab:d}'.format(**table))
+# templates formatted millions of times: examples/formatcache.py compiles them
 
 # manual string formatting
 
@@ -101,6 +103,7 @@ def to_bytes(bytes_or_str):
     return value # Instance of bytes
 
 to_bytes('abc')
+# chunked, constant-memory versions for large streams: examples/streamcodec.py
 
 with open('/tmp/random.bin', 'wb') as f: # must open in binary mode
     f.write(os.urandom(10)) # encoding='utf-8'